@@ -1,98 +1,271 @@
 from enum import Enum
 import time
-from typing import Literal, List, Dict, Tuple
+from typing import Literal, List, Dict, Tuple, Callable, Iterator, TYPE_CHECKING
 from collections import deque
+from collections.abc import Mapping
+from collections import OrderedDict
 import os
-import random, copy
+import random
+import itertools
+
+if TYPE_CHECKING:
+    from akari_cache import ResultCache
+
+# cell kinds stored in Akari.kinds
+WHITE = 0
+BLACK = 1
+
+# stored in Akari.clues for cells without a number
+NO_CLUE = 255
+
+# lamp values stored in SolutionState.values
+UNASSIGNED = 0
+LAMP = 1
+NO_LAMP = 2
+
+LAMP_VALUE_CODES = {None: UNASSIGNED, True: LAMP, False: NO_LAMP}
+LAMP_VALUES = (None, True, False)
+
+# results akari_cache keeps on disk are only trusted from the same version. bump it with any change
+# to what the solvers or the rater return for a puzzle (solutions, counters, ratings)
+SOLVER_VERSION = 2
+
 
 class Cell:
     x: int
     y: int
-    is_black: bool
-    number: int | None
+    index: int
     akari: 'Akari'
-    
+
     # these are for use with the GUI
     highlight_rect: int | str | None
     id: int | str | None
-    
+
+    # a cell is a view onto akari.kinds / akari.clues, so edits made through it (GUI, generator)
+    # are seen by the solver without any syncing
     def __init__(self, akari:'Akari', x, y, is_black=False, number=None):
         self.akari = akari
         self.x = x
         self.y = y
-        self.is_black = is_black
-        self.number = number
+        self.index = akari.cell_index(x, y)
+        if is_black:
+            self.is_black = is_black
+        if number is not None:
+            self.number = number
         self.highlight_rect = None
         self.id = None
 
+    @property
+    def is_black(self) -> bool:
+        return self.akari.kinds[self.index] == BLACK
+
+    @is_black.setter
+    def is_black(self, value: bool):
+        self.akari.kinds[self.index] = BLACK if value else WHITE
+        self.akari.invalidate_geometry()
+
+    @property
+    def number(self) -> int | None:
+        number = self.akari.clues[self.index]
+        return None if number == NO_CLUE else number
+
+    @number.setter
+    def number(self, value: int | None):
+        self.akari.clues[self.index] = NO_CLUE if value is None else value
+        self.akari.invalidate_geometry()
+
     def __str__(self):
         return str(self.coords())
-    
+
     def __repr__(self):
         return self.__str__()
 
     def get_key(self):
         return self.coords()
-    
+
     def distance_to_cell(self, cell):
         return ((self.x - cell.x)**2 + (self.y - cell.y)**2)**0.5
-    
+
     def adjacent_cells(self, white_only=False, numbered_only=False, non_illuminated:'SolutionState|None'=None):
-        count = 0
-        neighbors = [(self.x+1, self.y), (self.x-1, self.y), (self.x, self.y+1), (self.x, self.y-1)]
+        # worked out from the coordinates rather than akari.geometry, which the generator would
+        # otherwise rebuild after every cell it edits
+        akari = self.akari
+        x, y = self.x, self.y
         final_neighbors: list[tuple[int, int]] = []
-        
-        for neighbor in neighbors:
-            if neighbor in self.akari.cells.keys():
-                white_satisfied = not white_only or (white_only and not self.akari.cells[neighbor].is_black)
-                numbered_satisfied = not numbered_only or (numbered_only and self.akari.cells[neighbor].number is not None)
-                non_illuminated_satisfied = not non_illuminated or (non_illuminated and not non_illuminated.illuminated_cells[neighbor])
-
-                if white_satisfied and numbered_satisfied and non_illuminated_satisfied:
-                    final_neighbors.append(neighbor)
-                
+
+        # same order as GridGeometry.neighbors
+        for neighbor_x, neighbor_y in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if not (0 <= neighbor_x < akari.grid_size_x and 0 <= neighbor_y < akari.grid_size_y):
+                continue
+            neighbor = neighbor_x * akari.grid_size_y + neighbor_y
+            white_satisfied = not white_only or akari.kinds[neighbor] != BLACK
+            numbered_satisfied = not numbered_only or akari.clues[neighbor] != NO_CLUE
+            non_illuminated_satisfied = not non_illuminated or not non_illuminated.is_lit(neighbor)
+
+            if white_satisfied and numbered_satisfied and non_illuminated_satisfied:
+                final_neighbors.append((neighbor_x, neighbor_y))
+
         return final_neighbors
-    
+
     def coords(self):
         return (self.x, self.y)
 
 
+class GridGeometry:
+    # flat lookup tables for one layout of an Akari puzzle. cells are addressed by index
+    # x * grid_size_y + y, which is the same order Akari.cells iterates in
+    grid_size_x: int
+    grid_size_y: int
+    size: int
+    coords: list[tuple[int, int]]
+    neighbors: list[tuple[int, ...]]
+    white_neighbors: list[tuple[int, ...]]
+    adjacent_clues: list[tuple[int, ...]]
+    clue_cells: tuple[int, ...]
+    near_clue: bytearray
+    segments: list[tuple[int, ...]]
+    row_segment: list[int]
+    column_segment: list[int]
+    segment_clues: list[tuple[int, ...]]
+    layout_hash: int
+    zobrist: list[int]
+
+    def __init__(self, grid_size_x: int, grid_size_y: int, kinds: bytearray, clues: bytearray):
+        self.grid_size_x = grid_size_x
+        self.grid_size_y = grid_size_y
+        self.size = grid_size_x * grid_size_y
+        self.coords = [(x, y) for x in range(grid_size_x) for y in range(grid_size_y)]
+
+        self.neighbors = []
+        for x, y in self.coords:
+            # same order as the original (x+1, y), (x-1, y), (x, y+1), (x, y-1) walk
+            neighbors = []
+            if x + 1 < grid_size_x:
+                neighbors.append((x + 1) * grid_size_y + y)
+            if x - 1 >= 0:
+                neighbors.append((x - 1) * grid_size_y + y)
+            if y + 1 < grid_size_y:
+                neighbors.append(x * grid_size_y + y + 1)
+            if y - 1 >= 0:
+                neighbors.append(x * grid_size_y + y - 1)
+            self.neighbors.append(tuple(neighbors))
+
+        self.white_neighbors = [tuple(n for n in neighbors if kinds[n] != BLACK) for neighbors in self.neighbors]
+        self.adjacent_clues = [tuple(n for n in neighbors if clues[n] != NO_CLUE) for neighbors in self.neighbors]
+        self.clue_cells = tuple(i for i in range(self.size) if clues[i] != NO_CLUE)
+
+        # white cells next to a clue above zero, searched first by SolutionState.unassigned_lamps
+        self.near_clue = bytearray(self.size)
+        for i in self.clue_cells:
+            if clues[i] > 0:
+                for n in self.white_neighbors[i]:
+                    self.near_clue[n] = 1
+
+        # every white cell belongs to exactly one row segment and one column segment (maximal runs of
+        # white cells). a lamp lights exactly the other cells of its two segments
+        self.segments = []
+        self.row_segment = [-1] * self.size
+        self.column_segment = [-1] * self.size
+        for y in range(grid_size_y):
+            self.add_segments([x * grid_size_y + y for x in range(grid_size_x)], kinds, self.row_segment)
+        for x in range(grid_size_x):
+            self.add_segments([x * grid_size_y + y for y in range(grid_size_y)], kinds, self.column_segment)
+
+        # clues touching any cell of a segment, i.e. the clues a lamp in that segment can affect
+        self.segment_clues = [tuple(sorted({c for i in segment for c in self.adjacent_clues[i]})) for segment in self.segments]
+
+        # zobrist keys for SolutionState.hash: zobrist[3 * i + value] for each lamp value of cell i,
+        # UNASSIGNED hashing to 0. the layout is folded in so states of different puzzles don't mix
+        self.layout_hash = hash((grid_size_x, grid_size_y, bytes(kinds), bytes(clues))) & (2**64 - 1)
+        keys = random.Random(self.size)
+        self.zobrist = []
+        for _ in range(self.size):
+            self.zobrist += [0, keys.getrandbits(64), keys.getrandbits(64)]
+
+    def add_segments(self, line: list[int], kinds: bytearray, segment_of: list[int]):
+        run: list[int] = []
+        for i in line + [-1]:
+            if i >= 0 and kinds[i] != BLACK:
+                run.append(i)
+            elif run:
+                for j in run:
+                    segment_of[j] = len(self.segments)
+                self.segments.append(tuple(run))
+                run = []
+
+    def light_sources(self, i: int) -> tuple[int, ...]:
+        # every cell that could light cell i, not counting i itself
+        if self.row_segment[i] < 0:
+            return ()
+        row = self.segments[self.row_segment[i]]
+        column = self.segments[self.column_segment[i]]
+        return tuple(j for j in row if j != i) + tuple(j for j in column if j != i)
+
+
 class Akari:
     grid_size_x: int
     grid_size_y: int
+    kinds: bytearray
+    clues: bytearray
     cells: dict[tuple[int, int], Cell]
-    
+    _geometry: GridGeometry | None
+
     def __init__(self, grid_size_x=7, grid_size_y=7):
         self.set_grid_size(grid_size_x, grid_size_y)
         self.reset_cells()
-        
+
     def set_grid_size(self, x, y):
         self.grid_size_x = x
         self.grid_size_y = y
-        
+
     def reset_cells(self):
+        size = self.grid_size_x * self.grid_size_y
+        self.kinds = bytearray(size)
+        self.clues = bytearray([NO_CLUE]) * size
+        self.invalidate_geometry()
         self.cells = {(x, y): Cell(self, x, y) for x in range(self.grid_size_x) for y in range(self.grid_size_y)}
-        
+
+    def cell_index(self, x: int, y: int) -> int:
+        return x * self.grid_size_y + y
+
+    def invalidate_geometry(self):
+        self._geometry = None
+
+    @property
+    def geometry(self) -> GridGeometry:
+        # rebuilt lazily after any change to a cell's color or number
+        if self._geometry is None:
+            self._geometry = GridGeometry(self.grid_size_x, self.grid_size_y, self.kinds, self.clues)
+        return self._geometry
+
     def numbered_cells(self):
-        return [cell for cell in self.cells.values() if cell.number is not None]
-        
+        clues = self.clues
+        return [cell for cell in self.cells.values() if clues[cell.index] != NO_CLUE]
+
     def white_cells_adjacent_to_numbered_cells(self):
         cells = set()
         for cell in self.numbered_cells():
             if cell.number is not None and cell.number > 0:
                 cells.update(cell.adjacent_cells(white_only=True))
         return list(cells)
-    
+
     def cells_that_must_have_lamps(self, solution:'SolutionState|None'=None) -> set[tuple[int, int]]:
-        numbered_cells = [cell for cell in self.cells.values() if cell.number is not None]
-        cells_that_must_have_lamps:list[tuple[int, int]] = []
-        
-        for cell in numbered_cells:
-            white_neighbors = cell.adjacent_cells(white_only=True, non_illuminated=solution)
-            if len(white_neighbors) == cell.number:
-                cells_that_must_have_lamps.extend(white_neighbors)
-        
-        return set(cells_that_must_have_lamps)
+        coords = self.geometry.coords
+        return {coords[i] for i in self.must_have_lamp_indices(solution)}
+
+    def must_have_lamp_indices(self, solution:'SolutionState|None'=None) -> set[int]:
+        geometry = self.geometry
+        clues = self.clues
+        cells_that_must_have_lamps: set[int] = set()
+
+        for i in geometry.clue_cells:
+            white_neighbors = geometry.white_neighbors[i]
+            if solution:
+                white_neighbors = tuple(n for n in white_neighbors if not solution.is_lit(n))
+            if len(white_neighbors) == clues[i]:
+                cells_that_must_have_lamps.update(white_neighbors)
+
+        return cells_that_must_have_lamps
 
     def load_from_file(self, filename):
         filename = os.path.normpath(filename)
@@ -162,389 +335,1383 @@ class Akari:
                     akari_file.write(int(byte, base=2).to_bytes(1, 'big'))
 
 
+
+
+class CellValueMap(Mapping):
+    # read-only (x, y) keyed view over one of SolutionState's flat arrays, so the GUI and
+    # older callers can keep using solution.lamps[(x, y)] and solution.illuminated_cells[(x, y)]
+    def __init__(self, akari: Akari, value_of: Callable[[int], bool | None]):
+        self.akari = akari
+        self.value_of = value_of
+
+    def __getitem__(self, key: tuple[int, int]):
+        return self.value_of(self.akari.cells[key].index)
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        return iter(self.akari.cells)
+
+    def __len__(self):
+        return len(self.akari.cells)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
 class SolutionState:
-    lamps: dict[tuple[int, int], bool | None]
-    solved = bool
-    illuminated_cells: dict[tuple[int, int], bool]
+    values: bytearray
+    geometry: GridGeometry
+    segment_lamps: list[int]
+    row_segment: list[int]
+    column_segment: list[int]
+    clue_lamps: list[int]
+    clue_free: list[int]
+    segment_free: list[int]
+    free_cells: int
+    exhausted_segments: list[int]
+    over_clues: int
+    unsatisfied_clues: int
+    crowded_segments: int
+    dark_cells: int
+    trail: list[tuple[int, int, bool]] | None
+    contradiction: bool
+    reasons: list[int] | None
+    conflict: int
+    hash: int
+    solved: bool
     akari: Akari
     initial_propogation_iterations: int
-    
+
     def __init__(self, akari: Akari, print_debug=False, auto_find_cells_that_must_have_lamps=True):
-        self.lamps = {(x, y): None for x in range(akari.grid_size_x) for y in range(akari.grid_size_y)}
-        self.illuminated_cells = {(x, y): False for x in range(akari.grid_size_x) for y in range(akari.grid_size_y)}
+        # values holds UNASSIGNED / LAMP / NO_LAMP per cell index. everything else is a counter kept
+        # up to date by set_value(), see recount() for what each one means
+        self.values = bytearray(akari.grid_size_x * akari.grid_size_y)
         self.akari = akari
 
         self.solved = False
-        
-        for cell in akari.cells.values():
-            if cell.is_black:
-                self.lamps[(cell.x, cell.y)] = False
-                
+        self.trail = None
+        self.contradiction = False
+        self.reasons = None
+        self.conflict = 0
+
+        for i, kind in enumerate(akari.kinds):
+            if kind == BLACK:
+                self.values[i] = NO_LAMP
+
+        self.recount()
+
         prop_iters = 0
         if auto_find_cells_that_must_have_lamps:
             prop_iters += self.propagate_constraints()
 
         self.initial_propogation_iterations = prop_iters
-        
+
+    def __deepcopy__(self, memo):
+        # the puzzle is shared, only the per-cell arrays are copied
+        return self.copy()
+
+    def copy(self) -> 'SolutionState':
+        new_state = SolutionState.__new__(SolutionState)
+        new_state.values = bytearray(self.values)
+        new_state.akari = self.akari
+        new_state.geometry = self.geometry
+        new_state.row_segment = self.row_segment
+        new_state.column_segment = self.column_segment
+        new_state.segment_lamps = list(self.segment_lamps)
+        new_state.clue_lamps = list(self.clue_lamps)
+        new_state.clue_free = list(self.clue_free)
+        new_state.segment_free = list(self.segment_free)
+        new_state.free_cells = self.free_cells
+        new_state.hash = self.hash
+        new_state.exhausted_segments = list(self.exhausted_segments)
+        new_state.over_clues = self.over_clues
+        new_state.unsatisfied_clues = self.unsatisfied_clues
+        new_state.crowded_segments = self.crowded_segments
+        new_state.dark_cells = self.dark_cells
+        new_state.solved = self.solved
+        new_state.trail = None
+        new_state.contradiction = self.contradiction
+        new_state.reasons = None
+        new_state.conflict = 0
+        new_state.initial_propogation_iterations = self.initial_propogation_iterations
+        return new_state
+
+    def recount(self):
+        # rebuild every counter from values and the puzzle's current layout:
+        #   segment_lamps      lamps in each row / column segment
+        #   clue_lamps         lamps next to each clue (indexed by the clue's cell)
+        #   clue_free          unassigned, unlit white cells next to each clue
+        #   segment_free       unassigned, unlit white cells in each segment
+        #   free_cells         unassigned, unlit white cells on the whole board
+        #   exhausted_segments segments whose free count dropped to zero since the last forward_check
+        #   over_clues         clues with more lamps than their number
+        #   unsatisfied_clues  clues whose lamps don't match their number
+        #   crowded_segments   segments holding two or more lamps, i.e. lamps lighting each other
+        #   dark_cells         white cells with no lamp in either of their segments (unilluminated)
+        #   hash               zobrist hash of the layout and every cell's value
+        geometry = self.akari.geometry
+        clues = self.akari.clues
+        values = self.values
+        self.geometry = geometry
+        # segments only depend on which cells are black, and a state is thrown away when those change
+        self.row_segment = geometry.row_segment
+        self.column_segment = geometry.column_segment
+
+        self.hash = geometry.layout_hash
+        for i, value in enumerate(values):
+            self.hash ^= geometry.zobrist[3 * i + value]
+
+        self.segment_lamps = [0] * len(geometry.segments)
+        for i, value in enumerate(values):
+            if value == LAMP:
+                self.segment_lamps[self.row_segment[i]] += 1
+                self.segment_lamps[self.column_segment[i]] += 1
+        self.crowded_segments = sum(1 for lamps in self.segment_lamps if lamps > 1)
+
+        dark = [self.row_segment[i] >= 0 and not self.segment_lamps[self.row_segment[i]] and not self.segment_lamps[self.column_segment[i]]
+                for i in range(len(values))]
+        self.dark_cells = sum(dark)
+
+        self.segment_free = [0] * len(geometry.segments)
+        self.free_cells = 0
+        for i, value in enumerate(values):
+            if value == UNASSIGNED and dark[i]:
+                self.segment_free[self.row_segment[i]] += 1
+                self.segment_free[self.column_segment[i]] += 1
+                self.free_cells += 1
+        # forward_check looks at every segment without a free cell once after a recount
+        self.exhausted_segments = [s for s, free in enumerate(self.segment_free) if not free]
+
+        self.clue_lamps = [0] * len(values)
+        self.clue_free = [0] * len(values)
+        self.over_clues = 0
+        self.unsatisfied_clues = 0
+        for c in geometry.clue_cells:
+            for n in geometry.white_neighbors[c]:
+                if values[n] == LAMP:
+                    self.clue_lamps[c] += 1
+                elif values[n] == UNASSIGNED and dark[n]:
+                    self.clue_free[c] += 1
+            if self.clue_lamps[c] > clues[c]:
+                self.over_clues += 1
+            if self.clue_lamps[c] != clues[c]:
+                self.unsatisfied_clues += 1
+
+    def start_trail(self):
+        # from here on every assignment is recorded so it can be taken back with undo()
+        self.trail = []
+
+    def mark(self) -> int:
+        return len(self.trail) if self.trail is not None else 0
+
+    def start_reasons(self):
+        # from here on every assignment made by propagation records which search decisions it follows
+        # from, as a bitmask of decision levels in reasons[i], and a failed propagate_constraints() or
+        # forward_check() leaves the levels the failure depends on in conflict. assignments made
+        # before this depend on nothing. used by BacktrackingSearch for conflict-directed backjumping
+        self.reasons = [0] * len(self.values)
+        self.conflict = 0
+
+    def reason(self, i:int) -> int:
+        # the decisions i's assignment follows from, none if reasons aren't being kept
+        reasons = self.reasons
+        return reasons[i] if reasons is not None else 0
+
+    def light_reason(self, i:int) -> int:
+        # the decisions behind one of the lamps lighting i, choosing the one set up earliest
+        segments = self.geometry.segments
+        values = self.values
+        best = None
+        for segment in (self.row_segment[i], self.column_segment[i]):
+            if self.segment_lamps[segment]:
+                for j in segments[segment]:
+                    if values[j] == LAMP and j != i and (best is None or self.reason(j) < best):
+                        best = self.reason(j)
+        return best or 0
+
+    def blocked_reason(self, i:int) -> int:
+        # why i can't take a lamp: its own assignment, or a lamp lighting it
+        if self.values[i] != UNASSIGNED:
+            return self.reason(i)
+        return self.light_reason(i)
+
+    def clue_lamps_reason(self, c:int) -> int:
+        reason = 0
+        for n in self.geometry.white_neighbors[c]:
+            if self.values[n] == LAMP:
+                reason |= self.reason(n)
+        return reason
+
+    def clue_blocked_reason(self, c:int) -> int:
+        # why the clue's neighbours that aren't lamps can't become lamps either, which is what forces
+        # its remaining free cells or leaves it short
+        reason = 0
+        for n in self.geometry.white_neighbors[c]:
+            if self.values[n] != LAMP and not (self.values[n] == UNASSIGNED and self.is_dark(n)):
+                reason |= self.blocked_reason(n)
+        return reason
+
+    def invalid_reason(self, i:int) -> int:
+        # for a state made invalid by a lamp on i: the lamps crowding a clue or segment around i
+        clues = self.akari.clues
+        reason = 0
+        for c in self.geometry.adjacent_clues[i]:
+            if self.clue_lamps[c] > clues[c]:
+                reason |= self.clue_lamps_reason(c)
+        for segment in (self.row_segment[i], self.column_segment[i]):
+            if self.segment_lamps[segment] > 1:
+                for j in self.geometry.segments[segment]:
+                    if self.values[j] == LAMP:
+                        reason |= self.reason(j)
+        return reason
+
+    def undo(self, mark:int):
+        trail = self.trail
+        if trail is None:
+            return
+        while len(trail) > mark:
+            i, old_value, solved = trail.pop()
+            self.set_value(i, old_value)
+            self.solved = solved
+
     def __str__(self):
         return str(self.lamps)
-        
+
+    @property
+    def lamps(self) -> CellValueMap:
+        return CellValueMap(self.akari, lambda i: LAMP_VALUES[self.values[i]])
+
+    @property
+    def illuminated_cells(self) -> CellValueMap:
+        return CellValueMap(self.akari, self.is_lit)
+
+    def is_lit(self, i:int) -> bool:
+        # lit by some lamp other than one standing on the cell itself
+        row = self.row_segment[i]
+        if row < 0:
+            return False
+        lamps = self.segment_lamps[row] + self.segment_lamps[self.column_segment[i]]
+        if self.values[i] == LAMP:
+            lamps -= 2
+        return lamps > 0
+
+    def segment_has_lamp(self, segment:int) -> bool:
+        return self.segment_lamps[segment] > 0
+
     def unassigned_lamps(self) -> List[Tuple[int, int]]:
-        white_cells_adjacent_to_numbered_cells = [cell for cell in self.akari.white_cells_adjacent_to_numbered_cells()]
+        coords = self.geometry.coords
+        return [coords[i] for i in self.unassigned_indices()]
+
+    def unassigned_indices(self) -> List[int]:
+        near_clue = self.geometry.near_clue
+        row_segment = self.row_segment
+        column_segment = self.column_segment
+        segment_lamps = self.segment_lamps
+        values = self.values
         unassigned_high_priority = []
         the_rest = []
-        for key in self.lamps:
-            if self.lamps[key] is None and self.illuminated_cells[key] is False:
-                if key in white_cells_adjacent_to_numbered_cells:
-                    unassigned_high_priority.append(key)
+        for i in range(len(values)):
+            # an unassigned cell holds no lamp, so any lamp in its segments lights it
+            if values[i] == UNASSIGNED and not segment_lamps[row_segment[i]] and not segment_lamps[column_segment[i]]:
+                if near_clue[i]:
+                    unassigned_high_priority.append(i)
                 else:
-                    the_rest.append(key)
+                    the_rest.append(i)
         return unassigned_high_priority + the_rest
-        
+
     def cells_that_must_have_lamps(self) -> list[tuple[int, int]]:
-        cells = self.akari.cells_that_must_have_lamps(self)
-        final_cells = []
-        for cell in cells:
-            if not self.lamps[cell] == True:
-                final_cells.append(cell)
-        return final_cells
-            
+        coords = self.geometry.coords
+        return [coords[i] for i in self.must_have_lamp_indices()]
+
+    def must_have_lamp_indices(self) -> list[int]:
+        return [i for i in self.akari.must_have_lamp_indices(self) if self.values[i] != LAMP]
+
     def assigned_lamps(self, only_true=True):
-        return  [key for key in self.lamps if self.lamps[key]] if only_true \
-                else [key for key in self.lamps if self.lamps[key] is not None]
-    
+        coords = self.geometry.coords
+        return  [coords[i] for i, value in enumerate(self.values) if value == LAMP] if only_true \
+                else [coords[i] for i, value in enumerate(self.values) if value != UNASSIGNED]
+
     def forward_check(self):
-        # check if all unilluminated cells still could possibly be illuminated
-        
+        # check if all unilluminated cells still could possibly be illuminated. a cell's support only
+        # reaches zero when both of its segments run out of free cells, so only the dark cells of
+        # segments that did so since the last check need looking at. returns (ok, cells checked)
         iterations = 0
-        
-        for cell in self.unilluminated_cells():
-            iterations += 1
-            # if cell could contain a lamp, it could be valid
-            if self.cell_can_contain_lamp(*cell.coords()):
+        segments = self.geometry.segments
+        segment_free = self.segment_free
+        exhausted = self.exhausted_segments
+        self.exhausted_segments = []
+
+        for segment in exhausted:
+            # free cells may have come back since, e.g. after an undo
+            if segment_free[segment]:
                 continue
-            
-            cell_can_be_illuminated = False
-            # walk up, down, left, right from cell until we see a black cell or the edge of the grid
-            # right
-            for i in range(cell.x+1, self.akari.grid_size_x):
-                if self.akari.cells[(i, cell.y)].is_black:
-                    break
-                if self.cell_can_contain_lamp(i, cell.y):
-                    cell_can_be_illuminated = True
-                    break
-            # left
-            if not cell_can_be_illuminated:
-                for i in range(cell.x-1, -1, -1):
-                    if self.akari.cells[(i, cell.y)].is_black:
-                        break
-                    if self.cell_can_contain_lamp(i, cell.y):
-                        cell_can_be_illuminated = True
-                        break
-            # down
-            if not cell_can_be_illuminated:
-                for i in range(cell.y+1, self.akari.grid_size_y):
-                    if self.akari.cells[(cell.x, i)].is_black:
-                        break
-                    if self.cell_can_contain_lamp(cell.x, i):
-                        cell_can_be_illuminated = True
-                        break
-            # up
-            if not cell_can_be_illuminated:
-                for i in range(cell.y-1, -1, -1):
-                    if self.akari.cells[(cell.x, i)].is_black:
-                        break
-                    if self.cell_can_contain_lamp(cell.x, i):
-                        cell_can_be_illuminated = True
-                        break
-            if not cell_can_be_illuminated:
-                return False, iterations
-            
+            for i in segments[segment]:
+                iterations += 1
+                if self.is_dark(i) and not self.support(i):
+                    if self.reasons is not None:
+                        # every cell of both its segments is blocked
+                        self.conflict = 0
+                        for j in segments[self.row_segment[i]] + segments[self.column_segment[i]]:
+                            self.conflict |= self.blocked_reason(j)
+                    return False, iterations
+
         return True, iterations
-            
+
     def cell_can_contain_lamp(self, x:int, y:int):
-        cell = self.akari.cells[(x, y)]
-        
-        if self.illuminated_cells[(x, y)]:
+        return self.can_contain_lamp(self.akari.cell_index(x, y))
+
+    def can_contain_lamp(self, i:int):
+        if self.akari.kinds[i] == BLACK:
             return False
-        if cell.is_black:
+        if self.is_lit(i):
             return False
-        
-        adjacent_numbered_cells = cell.adjacent_cells(numbered_only=True)
-        for adj in adjacent_numbered_cells:
-            adj_cell = self.akari.cells[adj]
-            if adj_cell.number is not None and self.numbered_cell_num_lamps(adj_cell) == adj_cell.number:
+
+        clues = self.akari.clues
+        for adj in self.geometry.adjacent_clues[i]:
+            if self.clue_lamps[adj] == clues[adj]:
                 return False
-                
+
         return True
-    
+
     def cell_must_contain_lamp(self, x:int, y:int):
-        cell = self.akari.cells[(x, y)]
-        must_have_lamp = False
-        
-        adjacent_numbered_cells = cell.adjacent_cells(numbered_only=True)
-        for adj in adjacent_numbered_cells:
-            adj_cell = self.akari.cells[adj]
-            
-            adj_cell_white_cells = adj_cell.adjacent_cells(white_only=True)
-            for other_cell in adj_cell_white_cells:
-                if self.lamps[other_cell] is not None or self.illuminated_cells[other_cell] is True:
-                    adj_cell_white_cells.remove(other_cell)
-                    
-            if adj_cell.number is not None and self.numbered_cell_num_lamps(adj_cell) == adj_cell.number - 1 and len(adj_cell_white_cells) == 1:
-                must_have_lamp = True
-        
-        return must_have_lamp
-            
+        return self.must_contain_lamp(self.akari.cell_index(x, y))
+
+    def must_contain_lamp(self, i:int):
+        # a neighbouring clue is one lamp short and has a single free cell left
+        clues = self.akari.clues
+        for adj in self.geometry.adjacent_clues[i]:
+            if self.clue_lamps[adj] == clues[adj] - 1 and self.clue_free[adj] == 1:
+                return True
+        return False
+
     def numbered_cell_num_lamps(self, cell:Cell):
-        lamp_count = 0
-        for neighbor in cell.adjacent_cells(white_only=True):
-            if self.lamps[neighbor] is True:
-                lamp_count += 1
-        return lamp_count
-    
+        return self.clue_lamp_count(cell.index)
+
+    def clue_lamp_count(self, i:int):
+        if self.akari.clues[i] != NO_CLUE:
+            return self.clue_lamps[i]
+        return sum(1 for neighbor in self.geometry.white_neighbors[i] if self.values[neighbor] == LAMP)
+
     def assign_lamp_value(self, x, y, value):
-        old_value = self.lamps[(x, y)]
-        self.lamps[(x, y)] = value
-        if value is True:
-            self.update_illuminated_cells_for_lamp(x, y)
-        elif not value and old_value is True:
-            self.update_illuminated_cells()
+        self.assign(self.akari.cell_index(x, y), LAMP_VALUE_CODES[value])
+
+    def assign(self, i:int, value:int):
+        if self.trail is not None:
+            self.trail.append((i, self.values[i], self.solved))
+        self.set_value(i, value)
         self.is_solved()
-        
+
+    def set_value(self, i:int, value:int):
+        old_value = self.values[i]
+        if old_value == value:
+            return
+
+        # i stops counting as a free cell while it changes, and counts again after if it is still
+        # unassigned and unlit
+        if old_value == UNASSIGNED and self.is_dark(i):
+            self.change_free(i, -1)
+
+        self.values[i] = value
+        zobrist = self.geometry.zobrist
+        self.hash ^= zobrist[3 * i + old_value] ^ zobrist[3 * i + value]
+        # segment_lamps is a reference count of the lamps lighting each run, so placing and
+        # removing a lamp only touches the counters of its two segments and adjacent clues
+        if value == LAMP:
+            self.update_illuminated_cells_for_lamp(i)
+        elif old_value == LAMP:
+            self.update_illuminated_cells_for_removed_lamp(i)
+
+        if value == UNASSIGNED and self.is_dark(i):
+            self.change_free(i, 1)
+
+    def change_free(self, i:int, delta:int):
+        for c in self.geometry.adjacent_clues[i]:
+            self.clue_free[c] += delta
+        segment_free = self.segment_free
+        for segment in (self.row_segment[i], self.column_segment[i]):
+            segment_free[segment] += delta
+            if not segment_free[segment]:
+                self.exhausted_segments.append(segment)
+        self.free_cells += delta
+
+    def support(self, i:int) -> int:
+        # free cells that could still light i: the free cells of its two segments, counting i once
+        support = self.segment_free[self.row_segment[i]] + self.segment_free[self.column_segment[i]]
+        if self.values[i] == UNASSIGNED and self.is_dark(i):
+            support -= 1
+        return support
+
+    def is_dark(self, i:int) -> bool:
+        row = self.row_segment[i]
+        return row >= 0 and not self.segment_lamps[row] and not self.segment_lamps[self.column_segment[i]]
+
     def update_illuminated_cells(self):
-        self.illuminated_cells = {(x, y): False for x in range(self.akari.grid_size_x) for y in range(self.akari.grid_size_y)}
-        for lamp in [lamp for lamp in self.lamps.keys() if self.lamps[lamp]]:
-            for i in range(lamp[0]+1, self.akari.grid_size_x):
-                if self.akari.cells[(i, lamp[1])].is_black:
-                    break
-                self.illuminated_cells[(i, lamp[1])] = True
-            for i in range(lamp[0]-1, -1, -1):
-                if self.akari.cells[(i, lamp[1])].is_black:
-                    break
-                self.illuminated_cells[(i, lamp[1])] = True
-            for i in range(lamp[1]+1, self.akari.grid_size_y):
-                if self.akari.cells[(lamp[0], i)].is_black:
-                    break
-                self.illuminated_cells[(lamp[0], i)] = True
-            for i in range(lamp[1]-1, -1, -1):
-                if self.akari.cells[(lamp[0], i)].is_black:
-                    break
-                self.illuminated_cells[(lamp[0], i)] = True
-        
-    def update_illuminated_cells_for_lamp(self, x, y):
-        for i in range(x+1, self.akari.grid_size_x):
-            if self.akari.cells[(i, y)].is_black:
-                break
-            self.illuminated_cells[(i, y)] = True
-        for i in range(x-1, -1, -1):
-            if self.akari.cells[(i, y)].is_black:
-                break
-            self.illuminated_cells[(i, y)] = True
-        for i in range(y+1, self.akari.grid_size_y):
-            if self.akari.cells[(x, i)].is_black:
-                break
-            self.illuminated_cells[(x, i)] = True
-        for i in range(y-1, -1, -1):
-            if self.akari.cells[(x, i)].is_black:
-                break
-            self.illuminated_cells[(x, i)] = True
-    
+        # full recount from the lamps on the board, only needed if values or the puzzle's clues were
+        # edited directly
+        self.recount()
+
+    def update_illuminated_cells_for_lamp(self, i:int):
+        clues = self.akari.clues
+        for c in self.geometry.adjacent_clues[i]:
+            lamps = self.clue_lamps[c]
+            if lamps == clues[c]:
+                self.unsatisfied_clues += 1
+                self.over_clues += 1
+            elif lamps + 1 == clues[c]:
+                self.unsatisfied_clues -= 1
+            self.clue_lamps[c] = lamps + 1
+        self.change_segment_lamps(self.row_segment[i], 1, i)
+        self.change_segment_lamps(self.column_segment[i], 1, i)
+
+    def update_illuminated_cells_for_removed_lamp(self, i:int):
+        clues = self.akari.clues
+        for c in self.geometry.adjacent_clues[i]:
+            lamps = self.clue_lamps[c]
+            if lamps == clues[c] + 1:
+                self.unsatisfied_clues -= 1
+                self.over_clues -= 1
+            elif lamps == clues[c]:
+                self.unsatisfied_clues += 1
+            self.clue_lamps[c] = lamps - 1
+        self.change_segment_lamps(self.row_segment[i], -1, i)
+        self.change_segment_lamps(self.column_segment[i], -1, i)
+
+    def change_segment_lamps(self, segment:int, delta:int, lamp:int):
+        lamps = self.segment_lamps[segment]
+        self.segment_lamps[segment] = lamps + delta
+        if (delta > 0 and lamps == 1) or (delta < 0 and lamps == 2):
+            self.crowded_segments += delta
+
+        # only a segment going from dark to lit or back changes which cells are dark
+        if not ((delta > 0 and lamps == 0) or (delta < 0 and lamps == 1)):
+            return
+        row_segment = self.row_segment
+        column_segment = self.column_segment
+        segment_lamps = self.segment_lamps
+        values = self.values
+        for j in self.geometry.segments[segment]:
+            other = column_segment[j] if row_segment[j] == segment else row_segment[j]
+            if segment_lamps[other]:
+                continue
+            self.dark_cells -= delta
+            # the cell whose lamp changed is handled by set_value
+            if j != lamp and values[j] == UNASSIGNED:
+                self.change_free(j, -delta)
+
     def all_numbered_squares_satisfied(self):
-        for cell in self.akari.numbered_cells():
-            lamp_count = 0
-            for neighbor in cell.adjacent_cells(white_only=True):
-                if self.lamps[neighbor] is True:
-                    lamp_count += 1
-            if lamp_count != cell.number:
-                return False
-        return True
-    
-    def propagate_constraints(self):
-        changes_made = True
+        return self.unsatisfied_clues == 0
+
+    def propagate_constraints(self, changed:list[int] | None = None):
+        # clue driven propagation from a worklist. a clue whose lamps already match its number rules
+        # out its free neighbours, and a clue with exactly as many free neighbours as lamps still
+        # missing gets all of them. only the clues next to a changed cell are queued (or every clue
+        # when changed is None), and each new lamp only queues the clues along its two segments.
+        # returns the number of lamps placed; self.contradiction is set if some clue can no longer
+        # be satisfied
+        geometry = self.geometry
+        clues = self.akari.clues
+        values = self.values
+        reasons = self.reasons
         iterations = 0
-        while changes_made:
-            changes_made = False
-            
-            cells_that_must_have_lamps = self.cells_that_must_have_lamps()
-            if len(cells_that_must_have_lamps) > 0:
-                for cell in cells_that_must_have_lamps:
-                    iterations += 1
-                    self.assign_lamp_value(cell[0], cell[1], True)
-                changes_made = True
+        self.contradiction = False
+
+        queued = bytearray(len(values))
+        worklist = deque()
+
+        def enqueue(clue_cells):
+            for c in clue_cells:
+                if not queued[c]:
+                    queued[c] = 1
+                    worklist.append(c)
+
+        if changed is None:
+            enqueue(geometry.clue_cells)
+        else:
+            for i in changed:
+                enqueue(geometry.adjacent_clues[i])
+                if values[i] == LAMP:
+                    enqueue(geometry.segment_clues[self.row_segment[i]])
+                    enqueue(geometry.segment_clues[self.column_segment[i]])
+
+        while worklist:
+            c = worklist.popleft()
+            queued[c] = 0
+
+            lamps = self.clue_lamps[c]
+            free_count = self.clue_free[c]
+
+            if lamps > clues[c] or lamps + free_count < clues[c]:
+                self.contradiction = True
+                if reasons is not None:
+                    self.conflict = self.clue_lamps_reason(c) if lamps > clues[c] else self.clue_blocked_reason(c)
+                break
+
+            if not free_count or clues[c] - lamps not in (0, free_count):
                 continue
-                
-            for cell in self.akari.cells.values():
-                if cell.is_black or self.lamps[cell.coords()] is not None:
-                    continue
-                
-                must_have_lamp, cannot_have_lamp = self.check_cell_constraints(cell)
-                if must_have_lamp:
-                    self.assign_lamp_value(cell.x, cell.y, True)
-                    if self.is_valid():
-                        iterations += 1
-                        changes_made = True
-                        break
-                    else:
-                        self.assign_lamp_value(cell.x, cell.y, None)
-                elif cannot_have_lamp:
-                    self.assign_lamp_value(*cell.coords(), False)
-                    if self.is_valid():
-                        changes_made = True
+
+            free = [n for n in geometry.white_neighbors[c] if values[n] == UNASSIGNED and self.is_dark(n)]
+            if lamps == clues[c]:
+                reason = self.clue_lamps_reason(c) if reasons is not None else 0
+                for n in free:
+                    self.assign(n, NO_LAMP)
+                    if reasons is not None:
+                        reasons[n] = reason
+                    enqueue(geometry.adjacent_clues[n])
+            else:
+                reason = self.clue_blocked_reason(c) if reasons is not None else 0
+                for n in free:
+                    # an earlier lamp from this same clue may already light n
+                    if self.is_lit(n):
+                        self.contradiction = True
+                        if reasons is not None:
+                            self.conflict = reason | self.light_reason(n)
                         break
-                    else:
-                        self.assign_lamp_value(cell.x, cell.y, None)
+                    self.assign(n, LAMP)
+                    if reasons is not None:
+                        reasons[n] = reason
+                    iterations += 1
+                    enqueue(geometry.segment_clues[self.row_segment[n]])
+                    enqueue(geometry.segment_clues[self.column_segment[n]])
+                if self.contradiction:
+                    break
+
         self.is_solved()
         return iterations
 
     def check_cell_constraints(self, cell:Cell):
-        cannot_have_lamp = not self.cell_can_contain_lamp(cell.x, cell.y)
-        
-        must_have_lamp = self.cell_must_contain_lamp(cell.x, cell.y)
-                
+        cannot_have_lamp = not self.can_contain_lamp(cell.index)
+
+        must_have_lamp = self.must_contain_lamp(cell.index)
+
         return must_have_lamp, cannot_have_lamp
 
-    
+
     def all_numbered_squares_valid(self):
-        for cell in self.akari.numbered_cells():
-            lamp_count = 0
-            for neighbor in cell.adjacent_cells(white_only=True):
-                if self.lamps[neighbor] is True:
-                    lamp_count += 1
-            if cell.number is not None and lamp_count > cell.number:
-                return False
-        return True
-                
+        return self.over_clues == 0
+
     def all_cells_illuminated(self):
-        return self.unilluminated_cells() == []
-    
+        return self.dark_cells == 0
+
     def unilluminated_cells(self):
-        return [cell for cell in self.akari.cells.values() if not cell.is_black and not self.lamps[cell.coords()] and not self.illuminated_cells[cell.coords()]]
-    
+        cells = self.akari.cells
+        coords = self.geometry.coords
+        return [cells[coords[i]] for i in self.unilluminated_indices()]
+
+    def unilluminated_indices(self):
+        row_segment = self.row_segment
+        column_segment = self.column_segment
+        segment_lamps = self.segment_lamps
+        values = self.values
+        return (i for i in range(len(values))
+                if row_segment[i] >= 0 and values[i] != LAMP and not segment_lamps[row_segment[i]] and not segment_lamps[column_segment[i]])
+
     def illuminated_lamps(self):
-        lamps = []
-        
-        for lamp in self.assigned_lamps():
-            if self.illuminated_cells[lamp]:
-                lamps.append(lamp)
-                
-        return lamps
-    
+        coords = self.geometry.coords
+        segment_lamps = self.segment_lamps
+        # a lamp always counts itself once in each of its two segments
+        return [coords[i] for i, value in enumerate(self.values)
+                if value == LAMP and segment_lamps[self.row_segment[i]] + segment_lamps[self.column_segment[i]] > 2]
+
     def is_valid(self):
-        if not self.all_numbered_squares_valid():
-            return False
-        if len(self.illuminated_lamps()) > 1:
-            return False
-        return True
-    
+        # a lamp lit by another lamp always comes with a segment holding both of them
+        return self.over_clues == 0 and self.crowded_segments == 0
+
     def is_solved(self):
-        if self.all_numbered_squares_satisfied() and self.all_cells_illuminated() and len(self.illuminated_lamps()) == 0:
+        if self.unsatisfied_clues == 0 and self.dark_cells == 0 and self.crowded_segments == 0:
             self.solved = True
             return True
         return False
-    
-    
+
+
+class Region:
+    # an independent part of what is left to decide: free cells sharing no segment or unsatisfied
+    # clue with the free cells of any other region, so each region can be searched on its own
+    cells: list[int]
+    dark_cells: list[int]
+    clues: list[int]
+
+    def __init__(self):
+        self.cells = []
+        self.dark_cells = []
+        self.clues = []
+
+    def free_cells(self, state: SolutionState) -> int:
+        return sum(1 for i in self.cells if state.values[i] == UNASSIGNED and state.is_dark(i))
+
+    def is_solved(self, state: SolutionState) -> bool:
+        clues = state.akari.clues
+        return all(not state.is_dark(i) for i in self.dark_cells) and all(state.clue_lamps[c] == clues[c] for c in self.clues)
+
+
+def independent_regions(state: SolutionState) -> list[Region]:
+    # connected components of the free cells, where two free cells are connected if they share a
+    # segment (at most one lamp, and a lamp would light the other), could both light the same dark
+    # cell, or are next to the same unsatisfied clue. returns no regions if some dark cell or clue
+    # can't be satisfied at all, leaving that for the search to find
+    geometry = state.geometry
+    clues = state.akari.clues
+    values = state.values
+    size = len(values)
+    parent = list(range(size))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(cells):
+        root = -1
+        for i in cells:
+            if root < 0:
+                root = find(i)
+            else:
+                parent[find(i)] = root
+
+    free = [i for i in range(size) if values[i] == UNASSIGNED and state.is_dark(i)]
+    segment_free = [[] for _ in geometry.segments]
+    for i in free:
+        segment_free[geometry.row_segment[i]].append(i)
+        segment_free[geometry.column_segment[i]].append(i)
+    for cells in segment_free:
+        union(cells)
+
+    dark = [i for i in range(size) if values[i] != LAMP and state.is_dark(i)]
+    for i in dark:
+        sources = segment_free[geometry.row_segment[i]] + segment_free[geometry.column_segment[i]]
+        if not sources:
+            return []
+        union(sources)
+
+    unsatisfied = [c for c in geometry.clue_cells if state.clue_lamps[c] != clues[c]]
+    for c in unsatisfied:
+        cells = [n for n in geometry.white_neighbors[c] if values[n] == UNASSIGNED and state.is_dark(n)]
+        if not cells:
+            return []
+        union(cells)
+
+    regions: dict[int, Region] = {}
+    for i in free:
+        regions.setdefault(find(i), Region()).cells.append(i)
+    for i in dark:
+        sources = segment_free[geometry.row_segment[i]] or segment_free[geometry.column_segment[i]]
+        regions[find(sources[0])].dark_cells.append(i)
+    for c in unsatisfied:
+        neighbor = next(n for n in geometry.white_neighbors[c] if values[n] == UNASSIGNED and state.is_dark(n))
+        regions[find(neighbor)].clues.append(c)
+    return list(regions.values())
+
+
+def branch_clue_first(state: SolutionState, region: Region | None = None) -> int:
+    # the original ordering: the first free cell next to a numbered clue, else the first free cell
+    near_clue = state.geometry.near_clue
+    values = state.values
+    first = -1
+    for i in (region.cells if region else range(len(values))):
+        if values[i] == UNASSIGNED and state.is_dark(i):
+            if near_clue[i]:
+                return i
+            if first < 0:
+                first = i
+    return first
+
+
+def branch_fewest_sources(state: SolutionState, region: Region | None = None) -> int:
+    # the unlit cell with the fewest free cells left that could light it, branching on the first of
+    # those cells. a lamp there is tried first, which lights the cell outright
+    geometry = state.geometry
+    segment_free = state.segment_free
+    best, best_sources = -1, 0
+    for i in (region.dark_cells if region else range(len(state.values))):
+        if state.values[i] == LAMP or not state.is_dark(i):
+            continue
+        sources = segment_free[state.row_segment[i]] + segment_free[state.column_segment[i]]
+        if state.values[i] == UNASSIGNED:
+            # the cell is free itself, and counted in both of its segments
+            sources -= 1
+        if sources and (best < 0 or sources < best_sources):
+            best, best_sources = i, sources
+            if sources == 1:
+                break
+    if best < 0:
+        return branch_clue_first(state, region)
+    if state.values[best] == UNASSIGNED:
+        return best
+    for j in geometry.light_sources(best):
+        if state.values[j] == UNASSIGNED and state.is_dark(j):
+            return j
+    return branch_clue_first(state, region)
+
+
+def branch_tightest_clue(state: SolutionState, region: Region | None = None) -> int:
+    # a free neighbour of the unsatisfied clue with the least slack (free cells minus lamps still
+    # needed), so clue contradictions surface as early as possible
+    geometry = state.geometry
+    clues = state.akari.clues
+    best, best_slack = -1, 0
+    for c in (region.clues if region else geometry.clue_cells):
+        needed = clues[c] - state.clue_lamps[c]
+        free = state.clue_free[c]
+        if needed > 0 and free:
+            slack = free - needed
+            if best < 0 or slack < best_slack:
+                best, best_slack = c, slack
+    if best < 0:
+        return branch_fewest_sources(state, region)
+    for n in geometry.white_neighbors[best]:
+        if state.values[n] == UNASSIGNED and state.is_dark(n):
+            return n
+    return branch_fewest_sources(state, region)
+
+
+# variable ordering strategies for BacktrackingSearch, each returns the free cell to branch on,
+# within region if one is given
+BRANCHING_HEURISTICS: dict[str, Callable[[SolutionState, Region | None], int]] = {
+    'clue_first': branch_clue_first,
+    'fewest_sources': branch_fewest_sources,
+    'tightest_clue': branch_tightest_clue,
+}
+
+
+class DeadStateTable:
+    # zobrist hashes of search states known to have no solution, evicting the least recently used
+    # once the table reaches its memory cap. one table can be shared by every search that might
+    # revisit the same states, e.g. the repeated solves of one layout while generating a puzzle
+    max_bytes: int
+    max_entries: int
+    entries: OrderedDict[int, None]
+    hits: int
+    misses: int
+    evictions: int
+
+    # rough cost of one entry: the ordered dict's node and hash slot plus the int key
+    entry_bytes = 128
+
+    def __init__(self, max_bytes:int = 16 * 2**20):
+        self.max_bytes = max_bytes
+        self.max_entries = max(1, max_bytes // self.entry_bytes)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key: int) -> bool:
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, key: int):
+        self.entries[key] = None
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+class SolverStats:
+    # what the solver did, for callers that want more than solve()'s tuple. counters are the ones
+    # BacktrackingSearch.stats() returns, added up over every search this is passed to, so one
+    # SolverStats can follow a whole AkariGenerator run. it can be given wherever a stats dict is
+    # taken, and reads the same: stats['backtracks'].
+    #
+    # when enabled, the searches also add up the wall time spent in each phase (propagation,
+    # forward checking, ...) and call every node hook as hook(event, level, cell, state), event
+    # being 'decide' after a decision is assigned, 'fail' when it failed, 'solution' when it led to
+    # a solution and 'backjump' when the search resumes at level. disabled, only the counters are
+    # filled, and a search node costs nothing extra
+    enabled: bool
+    counters: dict[str, int]
+    heuristics: dict[str, int]
+    phase_times: dict[str, float]
+    phase_calls: dict[str, int]
+    node_hooks: list[Callable[[str, int, int, 'SolutionState'], None]]
+    searches: int
+
+    def __init__(self, enabled:bool = True, node_hooks: list[Callable[[str, int, int, 'SolutionState'], None]] | None = None):
+        self.enabled = enabled
+        self.counters = {}
+        # searches per branching heuristic
+        self.heuristics = {}
+        self.phase_times = {}
+        self.phase_calls = {}
+        self.node_hooks = list(node_hooks or [])
+        self.searches = 0
+
+    def __getitem__(self, key: str) -> int:
+        return self.counters.get(key, 0)
+
+    def update(self, counters: Mapping[str, int | str]):
+        # one more search, with its counters
+        self.searches += 1
+        self.add_counters(counters)
+
+    def add_counters(self, counters: Mapping[str, int | str]):
+        for key, value in counters.items():
+            if isinstance(value, str):
+                # the heuristic, counted per name
+                self.heuristics[value] = self.heuristics.get(value, 0) + 1
+            elif key == 'regions':
+                self.counters[key] = max(self.counters.get(key, 0), value)
+            else:
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def merge(self, other: 'SolverStats'):
+        # add in everything other recorded, from another process for instance
+        self.searches += other.searches
+        self.add_counters(other.counters)
+        for heuristic, searches in other.heuristics.items():
+            self.heuristics[heuristic] = self.heuristics.get(heuristic, 0) + searches
+        for phase, seconds in other.phase_times.items():
+            self.phase_times[phase] = self.phase_times.get(phase, 0.0) + seconds
+            self.phase_calls[phase] = self.phase_calls.get(phase, 0) + other.phase_calls[phase]
+
+    def add_time(self, phase: str, start: float):
+        # start is the time.perf_counter() the phase began at
+        self.phase_times[phase] = self.phase_times.get(phase, 0.0) + time.perf_counter() - start
+        self.phase_calls[phase] = self.phase_calls.get(phase, 0) + 1
+
+    def node(self, event: str, level: int, cell: int, state: 'SolutionState'):
+        for hook in self.node_hooks:
+            hook(event, level, cell, state)
+
+    def as_dict(self) -> dict:
+        return {'searches': self.searches, **self.counters, 'heuristics': dict(self.heuristics), 'phase_times': dict(self.phase_times), 'phase_calls': dict(self.phase_calls)}
+
+    def report(self) -> str:
+        lines = [f'searches: {self.searches}']
+        lines += [f'{key}: {value}' for key, value in self.counters.items()]
+        lines += [f'searches with {heuristic}: {searches}' for heuristic, searches in self.heuristics.items()]
+        for phase, seconds in sorted(self.phase_times.items(), key=lambda item: -item[1]):
+            lines.append(f'{phase}: {seconds * 1000:.2f}ms in {self.phase_calls[phase]} calls')
+        return '\n'.join(lines)
+
+
+class BacktrackingSearch:
+    # depth first search over lamp / no lamp decisions on a single SolutionState. every assignment
+    # made below a decision is recorded on the state's trail and undone when the branch fails, so
+    # a search node costs no copying. open decisions live on an explicit stack rather than the
+    # python call stack, so board size is only limited by memory. the counters follow the original
+    # recursive solve(): depth counts the nodes entered, and max_depth is an optional cap on that
+    # count for callers that want to bound the time spent.
+    #
+    # with backjumping, every failure is explained as the set of decision levels it follows from
+    # (see SolutionState.start_reasons). a decision whose level is not in that set is skipped
+    # without trying its other value, and small sets are kept as nogoods: combinations of
+    # decisions that fail wherever they show up again later in the search.
+    #
+    # with a DeadStateTable, every node found to have no solution is remembered by its hash and
+    # entered again as a dead end, in this search or any other sharing the table.
+    #
+    # with decompose, the free cells left after the initial propagation are split into independent
+    # regions (see independent_regions), each searched on its own, and their solutions combined
+    #
+    # with an enabled SolverStats, the time spent in each phase is added to it and its node hooks
+    # are called, see SolverStats
+    max_depth: int | None
+    heuristic: str
+    backjumping: bool
+    dead_states: DeadStateTable | None
+    decompose: bool
+    region: Region | None
+    should_stop: Callable[[], bool] | None
+    stopped: bool
+    timer: SolverStats | None
+    tracer: SolverStats | None
+    depth: int
+    total_prop_iters: int
+    total_check_iters: int
+    backtracks: int
+    decision_points: int
+    backjumps: int
+    skipped_levels: int
+    nogoods: list[tuple[tuple[int, int], ...]]
+    nogoods_by_cell: dict[int, list[tuple[tuple[int, int], ...]]]
+    nogood_prunes: int
+    dead_state_hits: int
+    dead_states_recorded: int
+    regions: int
+
+    max_nogood_size = 3
+    # nodes between two calls of should_stop
+    stop_check_interval = 256
+
+    def __init__(self, max_depth:int|None = None, depth:int = 0, total_prop_iters:int = 0, total_check_iters:int = 0, backtracks:int = 0, decision_points:int = 0, heuristic:str = 'clue_first', backjumping:bool = True, dead_states:DeadStateTable|None = None, decompose:bool = True, solver_stats:SolverStats|None = None):
+        if heuristic not in BRANCHING_HEURISTICS:
+            raise ValueError(f'unknown branching heuristic {heuristic!r}, expected one of {list(BRANCHING_HEURISTICS)}')
+        self.max_depth = max_depth
+        self.heuristic = heuristic
+        self.choose_cell = BRANCHING_HEURISTICS[heuristic]
+        self.backjumping = backjumping
+        self.dead_states = dead_states
+        self.decompose = decompose
+        self.region = None
+        # polled every stop_check_interval nodes, so another process can call the search off early
+        self.should_stop = None
+        self.stopped = False
+        # only set when there is something to do with them, so the hot paths test a single None
+        self.timer = solver_stats if solver_stats is not None and solver_stats.enabled else None
+        self.tracer = self.timer if self.timer and self.timer.node_hooks else None
+        self.depth = depth
+        self.total_prop_iters = total_prop_iters
+        self.total_check_iters = total_check_iters
+        self.backtracks = backtracks
+        self.decision_points = decision_points
+        self.backjumps = 0
+        self.skipped_levels = 0
+        self.nogoods = []
+        self.nogoods_by_cell = {}
+        self.nogood_prunes = 0
+        self.dead_state_hits = 0
+        self.dead_states_recorded = 0
+        self.regions = 0
+
+    def stats(self) -> dict[str, int | str]:
+        # the counters and the branching heuristic they were searched with
+        return {**self.counters(), 'heuristic': self.heuristic}
+
+    def counters(self) -> dict[str, int]:
+        return {
+            'depth': self.depth,
+            'total_prop_iters': self.total_prop_iters,
+            'total_check_iters': self.total_check_iters,
+            'backtracks': self.backtracks,
+            'decision_points': self.decision_points,
+            'backjumps': self.backjumps,
+            'skipped_levels': self.skipped_levels,
+            'nogoods': len(self.nogoods),
+            'nogood_prunes': self.nogood_prunes,
+            'dead_state_hits': self.dead_state_hits,
+            'dead_states_recorded': self.dead_states_recorded,
+            'regions': self.regions,
+        }
+
+    def run(self, state: SolutionState) -> SolutionState | None:
+        solutions = self.run_all(state, 1)
+        return solutions[0] if solutions else None
+
+    def run_all(self, state: SolutionState, limit:int) -> list[SolutionState]:
+        timer = self.timer
+        state = state.copy()
+        state.start_trail()
+        if self.backjumping:
+            state.start_reasons()
+
+        start = time.perf_counter() if timer else 0.0
+        regions = independent_regions(state) if self.decompose else []
+        if timer:
+            timer.add_time('decompose', start)
+        self.regions = max(len(regions), 1)
+        if len(regions) < 2:
+            return self.search(state, limit)
+
+        # a region's search only ever assigns its own cells, so the state is simply rolled back to
+        # the root between regions, and any combination of region solutions is a solution
+        root = state.mark()
+        region_solutions = []
+        for region in regions:
+            self.region = region
+            found = self.search(state, limit)
+            state.undo(root)
+            if not found or self.stopped:
+                self.region = None
+                return []
+            region_solutions.append(found)
+        self.region = None
+
+        solutions = []
+        for combination in itertools.islice(itertools.product(*region_solutions), limit):
+            solution = state.copy()
+            for region, region_solution in zip(regions, combination):
+                for i in region.cells:
+                    solution.assign(i, region_solution.values[i])
+            solutions.append(solution)
+        return solutions
+
+    def search(self, state: SolutionState, limit:int = 1) -> list[SolutionState]:
+        # returns up to limit solutions. the search carries on past each solution as if that leaf had
+        # failed, so every solution is reached exactly once
+        solutions: list[SolutionState] = []
+        # each frame is [cell being decided, index of the next value to try, trail mark before it,
+        # levels the failures below it so far depend on, hash of the node]. the frame at stack[k]
+        # is level k + 1
+        stack: list[list[int]] = []
+        timer = self.timer
+        tracer = self.tracer
+        # kept by the state while backjumping, which is the only time they are read or written here
+        reasons = state.reasons if state.reasons is not None else []
+
+        result, frame = self.enter(state)
+        if frame is None:
+            return [result] if result else solutions
+        stack.append(frame)
+
+        while stack and not self.stopped:
+            frame = stack[-1]
+            cell, next_value, mark, conflicts, _ = frame
+            level = len(stack)
+
+            if next_value == 2:
+                # both values failed below this decision, so the branch that led here failed too,
+                # because of the decisions left in conflicts. the latest of those is where to resume
+                stack.pop()
+                self.record_dead_state(frame, solutions)
+                conflicts &= ~(1 << level)
+                self.record_nogood(stack, conflicts)
+                target = conflicts.bit_length() - 1
+                if target < level - 1:
+                    self.backjumps += 1
+                    self.skipped_levels += level - 1 - target
+                    # the failure holds for the nodes jumped over as well
+                    for skipped in stack[target:]:
+                        self.record_dead_state(skipped, solutions)
+                    del stack[target:]
+                    if tracer:
+                        tracer.node('backjump', len(stack), stack[-1][0] if stack else -1, state)
+                if stack:
+                    self.backtracks += 1
+                    stack[-1][3] |= conflicts
+                    start = time.perf_counter() if timer else 0.0
+                    state.undo(stack[-1][2])
+                    if timer:
+                        timer.add_time('undo', start)
+                continue
+
+            frame[1] += 1
+            state.assign(cell, LAMP if next_value == 0 else NO_LAMP)
+            result = None
+            # a failure nothing explains depends on every decision so far
+            conflict = (1 << (level + 1)) - 2
+            if self.backjumping:
+                reasons[cell] = 1 << level
+            if tracer:
+                tracer.node('decide', level, cell, state)
+
+            start = time.perf_counter() if timer else 0.0
+            valid = state.is_valid()
+            if timer:
+                timer.add_time('validity', start)
+
+            if not valid:
+                if self.backjumping:
+                    conflict = state.invalid_reason(cell)
+            else:
+                start = time.perf_counter() if timer else 0.0
+                self.total_prop_iters += state.propagate_constraints([cell])
+                if timer:
+                    timer.add_time('propagation', start)
+                ok = not state.contradiction
+                if ok:
+                    # after propagation, so cells it ruled out are covered too
+                    start = time.perf_counter() if timer else 0.0
+                    ok, check_iters = state.forward_check()
+                    if timer:
+                        timer.add_time('forward_check', start)
+                    self.total_check_iters += check_iters
+                nogood = None
+                if ok and self.backjumping:
+                    start = time.perf_counter() if timer else 0.0
+                    nogood = self.matching_nogood(state, mark)
+                    if timer:
+                        timer.add_time('nogoods', start)
+                if not ok:
+                    if self.backjumping:
+                        conflict = state.conflict
+                elif nogood is not None:
+                    self.nogood_prunes += 1
+                    conflict = 0
+                    for i, _ in nogood:
+                        conflict |= reasons[i]
+                else:
+                    result, child = self.enter(state)
+                    if result:
+                        solutions.append(result)
+                        if tracer:
+                            tracer.node('solution', level, cell, state)
+                        if len(solutions) >= limit:
+                            return solutions
+                    if child is not None:
+                        stack.append(child)
+                        continue
+
+            if not result:
+                self.backtracks += 1
+                if tracer:
+                    tracer.node('fail', level, cell, state)
+            frame[3] |= conflict
+            if not conflict >> level & 1:
+                # this decision played no part in the failure, so its other value fails the same way
+                frame[1] = 2
+            start = time.perf_counter() if timer else 0.0
+            state.undo(mark)
+            if timer:
+                timer.add_time('undo', start)
+
+        return solutions
+
+    def record_dead_state(self, frame: list[int], solutions: list[SolutionState]):
+        # only while the node's failure is absolute: not once solutions were found (nogoods may then
+        # just mean no new solutions) and not once max_depth or should_stop cut the search short
+        if self.dead_states is None or solutions or self.stopped or (self.max_depth and self.depth > self.max_depth):
+            return
+        self.dead_states.add(frame[4])
+        self.dead_states_recorded += 1
+
+    def record_nogood(self, stack: list[list[int]], conflicts: int):
+        # the decisions at the levels in conflicts can't all hold in a solution (not yet found)
+        size = conflicts.bit_count()
+        if not self.backjumping or not size or size > self.max_nogood_size:
+            return
+        nogood = []
+        for level in range(1, conflicts.bit_length()):
+            if conflicts >> level & 1:
+                cell, next_value = stack[level - 1][0], stack[level - 1][1]
+                nogood.append((cell, LAMP if next_value == 1 else NO_LAMP))
+        nogood = tuple(nogood)
+        self.nogoods.append(nogood)
+        for cell, _ in nogood:
+            self.nogoods_by_cell.setdefault(cell, []).append(nogood)
+
+    def matching_nogood(self, state: SolutionState, mark:int) -> tuple[tuple[int, int], ...] | None:
+        # a nogood completed by one of the assignments made since mark
+        trail = state.trail
+        if not self.nogoods or trail is None:
+            return None
+        values = state.values
+        for i, _, _ in trail[mark:]:
+            for nogood in self.nogoods_by_cell.get(i, ()):
+                if all(values[cell] == value for cell, value in nogood):
+                    return nogood
+        return None
+
+    def enter(self, state: SolutionState) -> tuple[SolutionState | None, list[int] | None]:
+        # visit a search node: returns a solution, a new decision frame, or neither for a dead end
+        self.depth += 1
+
+        if self.max_depth and self.depth > self.max_depth:
+            return None, None
+
+        if self.should_stop and self.depth % self.stop_check_interval == 0 and self.should_stop():
+            self.stopped = True
+            return None, None
+
+        timer = self.timer
+        region = self.region
+        free_cells = region.free_cells(state) if region else state.free_cells
+        if free_cells == 0:
+            solved = region.is_solved(state) if region else state.solved
+            if not solved:
+                return None, None
+            start = time.perf_counter() if timer else 0.0
+            solution = state.copy()
+            if timer:
+                timer.add_time('copy', start)
+            return solution, None
+
+        if self.dead_states is not None:
+            start = time.perf_counter() if timer else 0.0
+            dead = state.hash in self.dead_states
+            if timer:
+                timer.add_time('dead_states', start)
+            if dead:
+                self.dead_state_hits += 1
+                return None, None
+
+        if free_cells > 1:
+            self.decision_points += 1
+
+        start = time.perf_counter() if timer else 0.0
+        cell = self.choose_cell(state, region)
+        if timer:
+            timer.add_time('branching', start)
+        return None, [cell, 0, state.mark(), 0, state.hash]
+
+
 def solve(
-    
+
             akari: Akari, \
             state: SolutionState | None = None, \
             depth:int = 0, max_depth:int|None = None, \
             total_prop_iters = 0, \
             total_check_iters = 0, \
             backtracks = 0, \
-            decision_points = 0 \
-    
+            decision_points = 0, \
+            engine: Literal['backtracking', 'bitboard', 'sat'] = 'backtracking', \
+            heuristic: str = 'clue_first', \
+            backjumping: bool = True, \
+            stats: dict[str, int | str] | SolverStats | None = None, \
+            dead_states: DeadStateTable | None = None, \
+            decompose: bool = True, \
+            workers: int | None = None, \
+            cache: 'ResultCache | None' = None \
+
     ) -> tuple[SolutionState | None, int, int, int, int, int]:
-    
-    depth += 1
-    
+
+    if cache is not None and state is None and not (depth or max_depth or total_prop_iters or total_check_iters or backtracks or decision_points):
+        # only a search from scratch is looked up in (and added to) the cache, see akari_cache
+        from akari_cache import cached_solve, solve_settings
+        settings = solve_settings(engine, heuristic, backjumping, decompose, dead_states is not None, bool(workers))
+        return cached_solve(cache, akari, settings, stats, lambda search_stats: solve(akari, engine=engine, heuristic=heuristic, backjumping=backjumping, stats=search_stats, dead_states=dead_states, decompose=decompose, workers=workers))
+
+    timer = phase_timer(stats)
+    if engine in ('bitboard', 'sat'):
+        start = time.perf_counter() if timer else 0.0
+        if engine == 'bitboard':
+            from akari_bitboard import solve_bitboard
+            result = solve_bitboard(akari, state, max_depth)
+        else:
+            from akari_sat import solve_sat
+            result = solve_sat(akari, state, max_depth)
+        if timer:
+            timer.add_time(engine, start)
+        if stats is not None:
+            stats.update(dict(zip(('depth', 'total_prop_iters', 'total_check_iters', 'backtracks', 'decision_points'), result[1:])))
+        return result
+
     if not state:
-        state = SolutionState(akari)
-        
-    unassigned_lamps = state.unassigned_lamps()
-    
-    if max_depth and depth > max_depth:
-        return None, depth, total_prop_iters, total_check_iters, backtracks, decision_points
-    
-    if len(unassigned_lamps) == 0 and state.solved:
-        return state, depth, total_prop_iters, total_check_iters, backtracks, decision_points
-    elif len(unassigned_lamps) == 0 and not state.solved:
-        return None, depth, total_prop_iters, total_check_iters, backtracks, decision_points
-    else:
-        if len(unassigned_lamps) > 1:
-            decision_points += 1
-            
-        for val in [True, False]:
-            new_state = copy.deepcopy(state)
-            new_state.assign_lamp_value(*unassigned_lamps[0], val)
-            if new_state.is_valid():
-                ok, check_iters = new_state.forward_check()
-                if ok:
-                    prop_iters = new_state.propagate_constraints()
-                    result, new_depth, new_prop_iters, new_check_iters, new_backtracks, new_decision_points = solve(
-                            akari, new_state, depth, max_depth, \
-                            total_prop_iters=total_prop_iters + prop_iters, \
-                            total_check_iters=total_check_iters + check_iters, \
-                            backtracks=backtracks, \
-                            decision_points=decision_points \
-                        )
-                    if result and result.solved:
-                        return result, new_depth, new_prop_iters, new_check_iters, new_backtracks, new_decision_points
-                    else:
-                        backtracks = new_backtracks + 1
-                        decision_points = new_decision_points
-                        total_check_iters = new_check_iters
-                        total_prop_iters = new_prop_iters
-                        depth = new_depth
-                else:
-                    backtracks += 1
-            else: 
-                backtracks += 1
-    return None, depth, total_prop_iters, total_check_iters, backtracks, decision_points
-    
-    
-def solve_basic(akari: Akari, state: SolutionState | None = None, depth:int = 0, max_depth:int|None = None) -> tuple[SolutionState | None, int]:
-    depth += 1
-    
+        state = initial_state(akari, timer)
+
+    if workers:
+        # the search split across a process pool, see akari_parallel. the solution doesn't depend
+        # on the number of workers
+        from akari_parallel import search_parallel
+        solutions, search_stats = search_parallel(akari, state, 1, workers, max_depth, heuristic, backjumping, decompose)
+        if stats is not None:
+            stats.update({**search_stats, 'heuristic': heuristic})
+        return solutions[0] if solutions else None, search_stats['depth'], search_stats['total_prop_iters'], search_stats['total_check_iters'], search_stats['backtracks'], search_stats['decision_points']
+
+    # heuristic picks the branching order of the backtracking engine, see BRANCHING_HEURISTICS.
+    # stats, if given, is filled with every counter of the search, backjumps and nogoods included.
+    # a SolverStats also gets the time spent per phase, see SolverStats
+    search = BacktrackingSearch(max_depth, depth, total_prop_iters, total_check_iters, backtracks, decision_points, heuristic, backjumping, dead_states, decompose, timer)
+    result = search.run(state)
+    if stats is not None:
+        stats.update(search.stats())
+    return result, search.depth, search.total_prop_iters, search.total_check_iters, search.backtracks, search.decision_points
+
+
+def phase_timer(stats: dict[str, int | str] | SolverStats | None) -> SolverStats | None:
+    # the SolverStats to time phases on, if stats is one and it is enabled
+    if isinstance(stats, SolverStats) and stats.enabled:
+        return stats
+    return None
+
+
+def initial_state(akari: Akari, timer: SolverStats | None) -> SolutionState:
+    # a new SolutionState, which runs the initial propagation, timed as its own phase
+    if not timer:
+        return SolutionState(akari)
+    start = time.perf_counter()
+    state = SolutionState(akari)
+    timer.add_time('initial_propagation', start)
+    return state
+
+
+def solve_basic(akari: Akari, state: SolutionState | None = None, depth:int = 0, max_depth:int|None = None, dead_states: DeadStateTable | None = None, stats: dict[str, int | str] | SolverStats | None = None) -> tuple[SolutionState | None, int]:
+    timer = phase_timer(stats)
     if not state:
-        state = SolutionState(akari)
-        
-    unassigned_lamps = state.unassigned_lamps()
-    
-    if max_depth and depth > max_depth:
-        return None, depth
-    
-    if len(unassigned_lamps) == 0 and state.solved:
-        return state, depth
-    elif len(unassigned_lamps) == 0 and not state.solved:
-        return None, depth
-    else:
-        for val in [True, False]:
-            new_state = copy.deepcopy(state)
-            new_state.assign_lamp_value(*unassigned_lamps[0], val)
-            if new_state.is_valid():
-                ok, check_iters = new_state.forward_check()
-                if ok:
-                    new_state.propagate_constraints()
-                    result, new_depth = solve_basic(akari, new_state, depth, max_depth)
-                    
-                    if result and result.solved:
-                        return result, new_depth, 
-                    else:
-                        depth = new_depth
-    return None, depth
-    
-    
+        state = initial_state(akari, timer)
+
+    search = BacktrackingSearch(max_depth, depth, dead_states=dead_states, solver_stats=timer)
+    result = search.run(state)
+    if stats is not None:
+        stats.update(search.stats())
+    return result, search.depth
+
+
+def count_solutions(akari: Akari, limit:int = 2, state: SolutionState | None = None, max_depth:int|None = None, heuristic: str = 'clue_first', engine: Literal['backtracking', 'sat'] = 'backtracking', dead_states: DeadStateTable | None = None, decompose: bool = True, workers: int | None = None, stats: dict[str, int | str] | SolverStats | None = None, cache: 'ResultCache | None' = None) -> tuple[int, list[SolutionState]]:
+    # one search that keeps going after the first solution and stops once limit solutions are found.
+    # returns the count and the solutions found. the count is exact when it is below limit, unless
+    # max_depth cut the search short, in which case it is only a lower bound. with decompose, each
+    # independent region is counted up to limit and the count is their product. stats is filled
+    # the same way as solve()'s, except with the sat engine. a count from scratch is looked up in
+    # cache first, see akari_cache
+    if cache is not None and state is None and max_depth is None:
+        from akari_cache import cached_count, solve_settings
+        settings = solve_settings(engine, heuristic, True, decompose, dead_states is not None, bool(workers))
+        return cached_count(cache, akari, limit, settings, stats, lambda search_stats: count_solutions(akari, limit, heuristic=heuristic, engine=engine, dead_states=dead_states, decompose=decompose, workers=workers, stats=search_stats))
+    if engine == 'sat':
+        from akari_sat import count_solutions_sat
+        return count_solutions_sat(akari, limit, state, max_depth)
+    if workers:
+        from akari_parallel import search_parallel
+        solutions, search_stats = search_parallel(akari, state, limit, workers, max_depth, heuristic, decompose=decompose)
+        if stats is not None:
+            stats.update({**search_stats, 'heuristic': heuristic})
+        return len(solutions), solutions
+
+    timer = phase_timer(stats)
+    if not state:
+        state = initial_state(akari, timer)
+
+    search = BacktrackingSearch(max_depth, heuristic=heuristic, dead_states=dead_states, decompose=decompose, solver_stats=timer)
+    solutions = search.run_all(state, limit)
+    if stats is not None:
+        stats.update(search.stats())
+    return len(solutions), solutions
+
+
+# share of the numbered walls solution_first_attempt tries to take the number off, per difficulty
+CLUE_REMOVAL_SHARE = {1: 0.5, 2: 0.8, 3: 1.0}
+
+
 class AkariGenerator:
+    dead_states: DeadStateTable
+    stats: SolverStats
+    attempts: int
+    attempts_per_second: float
+    repair: Literal['targeted', 'random']
+    construction: Literal['random', 'solution_first']
+    rating: Literal['search', 'deduction']
+    cache: 'ResultCache | None'
+    screened: dict[tuple[int, int], deque[Akari]]
+    rng: random.Random
+
+    def __init__(self, dead_state_bytes:int = 16 * 2**20, stats: SolverStats | None = None, repair: Literal['targeted', 'random'] = 'targeted', construction: Literal['random', 'solution_first'] = 'random', rating: Literal['search', 'deduction'] = 'search', cache: 'ResultCache | None' = None, rng: random.Random | None = None):
+        # every candidate layout is searched several times over (solve_basic, the uniqueness check,
+        # the final solve), so the searches share what they learn about dead states.
+        # stats adds up every one of those searches, plus the time spent drawing candidates and
+        # adjusting them when it is enabled (the adjusting time includes the searches it runs)
+        self.dead_states = DeadStateTable(dead_state_bytes)
+        self.stats = stats if stats is not None else SolverStats(enabled=False)
+        # how a candidate with several solutions is made unique: repair_for_single_solution, or the
+        # random edits of adjust_puzzle_for_single_solution
+        self.repair = repair
+        # how candidates are drawn: random walls and numbers (add_black_cells_and_clues), or walls,
+        # then a lamp placement, then the numbers it gives (solution_first_attempt)
+        self.construction = construction
+        # how a finished candidate's difficulty is judged: thresholds on a full solve's counters, or
+        # the deduction tiers it needs (see akari_rating)
+        self.rating = rating
+        # an akari_cache.ResultCache the uniqueness checks and difficulty scores are looked up in
+        # first, so a layout met before (in any orientation) isn't searched again
+        self.cache = cache
+        # boards batch_candidate drew and screened but hasn't handed out yet, by grid size
+        self.screened = {}
+        # every random choice the generator makes. without rng it is seeded from the random module
+        # here, so seeding that before making the generator still reproduces its puzzles, and
+        # the generator leaves the random module alone afterwards
+        self.rng = rng if rng is not None else random.Random(random.getrandbits(64))
+        # of the last generate_akari_puzzle
+        self.attempts = 0
+        self.attempts_per_second = 0.0
+
     def add_black_cells_and_clues(self, akari: Akari):
         # This function assumes that a solved grid has been generated and
         # aims to modify it to create an Akari puzzle.
-        num_black_cells = random.randint(akari.grid_size_x * akari.grid_size_y // 8, akari.grid_size_x * akari.grid_size_y // 3)
+        num_black_cells = self.rng.randint(akari.grid_size_x * akari.grid_size_y // 8, akari.grid_size_x * akari.grid_size_y // 3)
         
         # A simple strategy: turn some cells black around lamps and add clues
         for i in range(num_black_cells):
-            x = random.randint(0, akari.grid_size_x - 1)
-            y = random.randint(0, akari.grid_size_y - 1)
+            x = self.rng.randint(0, akari.grid_size_x - 1)
+            y = self.rng.randint(0, akari.grid_size_y - 1)
             
             cell_cannot_be_black = False
             
@@ -568,9 +1735,9 @@ class AkariGenerator:
             akari.cells[(x, y)].is_black = True
             
             # Randomly decide whether to add a clue (a number) or not
-            if random.choice([True, False]):
+            if self.rng.choice([True, False]):
                 while True:
-                    number = random.choice([0, 1, 1, 2, 2, 3, 3, 4])
+                    number = self.rng.choice([0, 1, 1, 2, 2, 3, 3, 4])
                     cell_neighbors = akari.cells[(x, y)].adjacent_cells(white_only=True)
                     if len(cell_neighbors) < number:
                         continue
@@ -589,29 +1756,46 @@ class AkariGenerator:
         
         return False
 
-    def check_unique_solution(self, akari: Akari, find_solution_different_than:SolutionState|None=None) -> tuple[bool, SolutionState | None]:
-        initial_state = SolutionState(akari)
-        if not find_solution_different_than:
-            solution, solvable_depth = solve_basic(akari, max_depth=self.max_depth(akari))
-        else:
-            solution = find_solution_different_than
-            solvable_depth = self.max_depth(akari)
-        
-        if not solution:
+    def batch_candidate(self, grid_size_x, grid_size_y, batch_size: int) -> Akari:
+        # draw random boards batch_size at a time and throw out the ones whose forced lamps clash in
+        # one vectorized pass, so the full lamps_must_intersect check only runs on the survivors.
+        # survivors not needed yet wait in self.screened for the next calls with the same size
+        from akari_batch import forced_lamps_conflict
+
+        queue = self.screened.setdefault((grid_size_x, grid_size_y), deque())
+        while True:
+            if not queue:
+                candidates = []
+                for _ in range(batch_size):
+                    akari = Akari(grid_size_x, grid_size_y)
+                    self.add_black_cells_and_clues(akari)
+                    candidates.append(akari)
+                queue.extend(akari for akari, conflict in zip(candidates, forced_lamps_conflict(candidates)) if not conflict)
+
+            while queue:
+                akari = queue.popleft()
+                if not self.lamps_must_intersect(akari):
+                    return akari
+
+    def check_unique_solution(self, akari: Akari, find_solution_different_than:SolutionState|None=None, engine: Literal['backtracking', 'sat'] = 'backtracking', workers: int | None = None, stats: dict[str, int | str] | SolverStats | None = None) -> tuple[bool, SolutionState | None]:
+        # a single search that stops at the second solution, split over workers processes if given.
+        # returns (unique, solution), where solution is a second one when the puzzle is not unique.
+        # the search is added to self.stats unless other stats are given
+        count, solutions = count_solutions(akari, limit=2, engine=engine, dead_states=self.dead_states, workers=workers, stats=stats if stats is not None else self.stats, cache=self.cache)
+
+        if find_solution_different_than:
+            lamps = find_solution_different_than.assigned_lamps()
+            for solution in solutions:
+                if solution.assigned_lamps() != lamps:
+                    return False, solution
+            return True, find_solution_different_than
+
+        if count == 0:
             return False, None
-        
-        for x, y in initial_state.unassigned_lamps():
-            if not solution.lamps[(x, y)]:
-                test_state = copy.deepcopy(initial_state)
-                test_state.assign_lamp_value(x, y, True)
-                
-                test_state, depth = solve_basic(akari, test_state, max_depth=(solvable_depth+2) if solvable_depth else None)
-                if test_state and test_state.solved:
-                    # If the puzzle can be solved with this change, it means there's at least a second solution
-                    return False, test_state
+        if count > 1:
+            return False, solutions[1]
+        return True, solutions[0]
 
-        return True, solution
-    
     def max_depth(self, akari: Akari):
         return int((akari.grid_size_x * akari.grid_size_y) / 2.5)
 
@@ -630,13 +1814,13 @@ class AkariGenerator:
             changes = []  # To track changes for potential reversion
 
             # Randomly choose a strategy for adjustment
-            strategy = random.choice(['add_black', 'remove_black', 'add_number', 'remove_number'])
+            strategy = self.rng.choice(['add_black', 'remove_black', 'add_number', 'remove_number'])
 
             if strategy == 'add_black':
                 # Find all white cells that can be turned black
                 white_cells = [(x, y) for (x, y), cell in akari.cells.items() if not cell.is_black and cell.number is None]
                 if white_cells:
-                    x, y = random.choice(white_cells)
+                    x, y = self.rng.choice(white_cells)
                     changes.append((x, y, False, akari.cells[(x, y)].number))  # Store current state for reversion
                     akari.cells[(x, y)].is_black = True
                     akari.cells[(x, y)].number = None  # Ensure no number on newly blackened cell
@@ -645,7 +1829,7 @@ class AkariGenerator:
                 # Find all black cells that can be turned white
                 black_cells = [(x, y) for (x, y), cell in akari.cells.items() if cell.is_black and cell.number is None]
                 if black_cells:
-                    x, y = random.choice(black_cells)
+                    x, y = self.rng.choice(black_cells)
                     changes.append((x, y, True, akari.cells[(x, y)].number))  # Store current state for reversion
                     akari.cells[(x, y)].is_black = False
 
@@ -653,8 +1837,8 @@ class AkariGenerator:
                 # Find black cells without numbers
                 eligible_cells = [(x, y) for (x, y), cell in akari.cells.items() if cell.is_black and cell.number is None]
                 if eligible_cells:
-                    x, y = random.choice(eligible_cells)
-                    number = random.randint(0, 4)  # Example: choose a random number, adjust logic as needed
+                    x, y = self.rng.choice(eligible_cells)
+                    number = self.rng.randint(0, 4)  # Example: choose a random number, adjust logic as needed
                     changes.append((x, y, akari.cells[(x, y)].is_black, None))  # Store current state for reversion
                     akari.cells[(x, y)].number = number
 
@@ -662,7 +1846,7 @@ class AkariGenerator:
                 # Find black cells with numbers
                 numbered_cells = [(x, y) for (x, y), cell in akari.cells.items() if cell.is_black and cell.number is not None]
                 if numbered_cells:
-                    x, y = random.choice(numbered_cells)
+                    x, y = self.rng.choice(numbered_cells)
                     changes.append((x, y, akari.cells[(x, y)].is_black, akari.cells[(x, y)].number))  # Store current state for reversion
                     akari.cells[(x, y)].number = None
 
@@ -675,44 +1859,242 @@ class AkariGenerator:
 
         return False  # Indicate failure if max attempts are reached
 
-    def generate_akari_puzzle(self, grid_size_x, grid_size_y, difficulty=1):
+    def distinguishing_edits(self, akari: Akari, first: SolutionState, second: SolutionState, prefer_walls:bool = False) -> list[tuple[int, bool, int | None]]:
+        # edits (cell, make black, number) that rule out second but not first, judged by the cells the
+        # two solutions disagree on. only the first kind there are any of is returned:
+        #   a number on a black cell next to such a cell, counting first's lamps around it
+        #   a numbered wall on a white cell next to one, where first has no lamp
+        #   a plain wall where second has a lamp and first doesn't
+        # numbers are only offered where second has a different count. with prefer_walls, plain walls
+        # come first, as numbers give the solver more to propagate and make the puzzle easier. walls
+        # can leave one of first's cells dark, which repair_for_single_solution checks
+        geometry = akari.geometry
+        kinds = akari.kinds
+        clues = akari.clues
+        first_lamps = first.values
+        second_lamps = second.values
+        differing = [i for i in range(geometry.size) if (first_lamps[i] == LAMP) != (second_lamps[i] == LAMP)]
+
+        def lamps_around(values: bytearray, i: int) -> int:
+            return sum(1 for n in geometry.neighbors[i] if values[n] == LAMP)
+
+        clue_edits = []
+        wall_edits = []
+        plain_walls = []
+        seen = set()
+        for i in differing:
+            for n in geometry.neighbors[i]:
+                if n in seen:
+                    continue
+                seen.add(n)
+                number = lamps_around(first_lamps, n)
+                if number == lamps_around(second_lamps, n):
+                    continue
+                if kinds[n] == BLACK:
+                    if clues[n] == NO_CLUE:
+                        clue_edits.append((n, False, number))
+                elif first_lamps[n] != LAMP:
+                    wall_edits.append((n, True, number))
+            if second_lamps[i] == LAMP:
+                plain_walls.append((i, True, None))
+        if prefer_walls:
+            return plain_walls or clue_edits or wall_edits
+        return clue_edits or wall_edits or plain_walls
+
+    def repair_for_single_solution(self, akari: Akari, max_repairs:int|None = None, prefer_walls:bool = False) -> tuple[bool, SolutionState | None]:
+        # the targeted take on adjust_puzzle_for_single_solution: rather than random edits, each
+        # repair takes the two solutions the last uniqueness check found and applies one of
+        # distinguishing_edits, so the second is gone while the first still holds. the first is
+        # checked on the edited board straight away (a wall may leave a cell dark) before the next
+        # full check, so every full check after the first follows an edit that is known to help.
+        # returns what check_unique_solution does
+        if max_repairs is None:
+            max_repairs = akari.grid_size_x * akari.grid_size_y
+        count, solutions = count_solutions(akari, limit=2, dead_states=self.dead_states, stats=self.stats)
+
+        for _ in range(max_repairs):
+            if count != 2:
+                break
+            first, second = solutions
+            lamps = [i for i, value in enumerate(first.values) if value == LAMP]
+            edits = self.distinguishing_edits(akari, first, second, prefer_walls)
+            self.rng.shuffle(edits)
+
+            for i, make_black, number in edits:
+                cell = akari.cells[akari.geometry.coords[i]]
+                was_black, previous_number = cell.is_black, cell.number
+                cell.is_black = make_black or was_black
+                cell.number = number
+
+                state = SolutionState(akari, auto_find_cells_that_must_have_lamps=False)
+                for lamp in lamps:
+                    state.assign(lamp, LAMP)
+                if state.is_solved():
+                    break
+                cell.is_black, cell.number = was_black, previous_number
+            else:
+                # nothing tells these two apart without losing the first as well
+                break
+
+            count, solutions = count_solutions(akari, limit=2, dead_states=self.dead_states, stats=self.stats)
+
+        if count == 0:
+            return False, None
+        if count > 1:
+            return False, solutions[1]
+        return True, solutions[0]
+
+    def generate_akari_puzzle(self, grid_size_x, grid_size_y, difficulty=1, batch_size:int|None = None, workers:int|None = None, seed:int|None = None):
         # Difficulty is from 1 to 3
+        # batch_size screens random boards in bulk with numpy (see akari_batch) before the per board checks
+        # workers runs seeded attempts in a process pool instead, see akari_parallel.generate_parallel
+        if workers:
+            from akari_parallel import generate_parallel
+            return generate_parallel(self, grid_size_x, grid_size_y, difficulty, batch_size, workers, seed)
+
+        if seed is not None:
+            self.rng.seed(seed)
         attempts = 0
+        start = time.perf_counter()
         
         while True:
             print(f'iteration {attempts}')
             attempts += 1
-        
+            akari = self.generate_attempt(grid_size_x, grid_size_y, difficulty, batch_size)
+            if akari:
+                self.report_attempts(attempts, time.perf_counter() - start)
+                return akari
+
+    def report_attempts(self, attempts: int, seconds: float):
+        self.attempts = attempts
+        self.attempts_per_second = attempts / seconds if seconds else 0.0
+        print(f'{attempts} attempts in {seconds:.2f}s ({self.attempts_per_second:.1f} attempts/s)')
+
+    def generate_attempt(self, grid_size_x, grid_size_y, difficulty=1, batch_size:int|None = None) -> Akari | None:
+        # one random candidate, made unique and scored. returns it if it scores difficulty
+        if self.construction == 'solution_first':
+            return self.solution_first_attempt(grid_size_x, grid_size_y, difficulty)
+        timer = phase_timer(self.stats)
+        start = time.perf_counter() if timer else 0.0
+        if batch_size:
+            akari = self.batch_candidate(grid_size_x, grid_size_y, batch_size)
+        else:
             akari = Akari(grid_size_x, grid_size_y)
             self.add_black_cells_and_clues(akari)
             
             while self.lamps_must_intersect(akari):
                 akari = Akari(grid_size_x, grid_size_y)
                 self.add_black_cells_and_clues(akari)
-                
-            solution, depth = solve_basic(akari, max_depth=self.max_depth(akari))
-            
-            if not solution:
-                continue
-            else:
-                self.adjust_puzzle_for_single_solution(akari,)
+        if timer:
+            timer.add_time('candidates', start)
             
+        solution, depth = solve_basic(akari, max_depth=self.max_depth(akari), dead_states=self.dead_states, stats=self.stats)
+        
+        if not solution:
+            return None
+
+        start = time.perf_counter() if timer else 0.0
+        if self.repair == 'targeted':
+            unique, solution = self.repair_for_single_solution(akari, prefer_walls=difficulty == 3)
+            if timer:
+                timer.add_time('adjust', start)
+        else:
+            self.adjust_puzzle_for_single_solution(akari,)
+            if timer:
+                timer.add_time('adjust', start)
             unique, solution = self.check_unique_solution(akari)
-            
-            if unique and solution:
-                solution, depth, total_prop_iters, total_check_iters, backtracks, decision_points = solve(akari)
-                if solution:
-                    initial_lamps_through_propagation = solution.initial_propogation_iterations
-                    total_lamps = len([lamp for lamp in solution.lamps if solution.lamps[lamp] is True])
-                    amt_lamps_through_propagation = (initial_lamps_through_propagation + total_prop_iters) / total_lamps
-                    amt_lamps_through_init_propagation = (initial_lamps_through_propagation) / total_lamps
-                    if difficulty == 1 and ((backtracks <= 4) or (depth <= 8) or (decision_points <= 8) or amt_lamps_through_propagation >= 0.5) and amt_lamps_through_init_propagation > 0.05:
-                            print(f'puzzle generated successfully for score {difficulty}')
-                            return akari
-                    elif difficulty == 2 and ((backtracks <= 8 and backtracks > 4) or (depth <= 16 and depth > 8) or (decision_points <= 16 and decision_points > 8) or (amt_lamps_through_propagation >= 0.1 and amt_lamps_through_propagation < 0.5)):
-                            print(f'puzzle generated successfully for score {difficulty}')
-                            return akari
-                    elif difficulty == 3 and ((backtracks > 8) or (depth > 16) or (decision_points > 16)):
-                            print(f'puzzle generated successfully for score {difficulty}')
-                            return akari
-        
\ No newline at end of file
+        
+        if unique and solution and self.matches_difficulty(akari, difficulty):
+            return akari
+        return None
+
+    def matches_difficulty(self, akari: Akari, difficulty: int) -> bool:
+        if self.rating == 'deduction':
+            from akari_rating import rate_difficulty
+            timer = phase_timer(self.stats)
+            start = time.perf_counter() if timer else 0.0
+            matches = rate_difficulty(akari, difficulty, self.cache)
+            if timer:
+                timer.add_time('rating', start)
+            if matches:
+                print(f'puzzle generated successfully for score {difficulty}')
+            return matches
+
+        # scored on a fresh search, as states remembered from the earlier ones would make it look easier
+        solution, depth, total_prop_iters, total_check_iters, backtracks, decision_points = solve(akari, stats=self.stats, cache=self.cache)
+        if solution:
+            initial_lamps_through_propagation = solution.initial_propogation_iterations
+            total_lamps = len([lamp for lamp in solution.lamps if solution.lamps[lamp] is True])
+            amt_lamps_through_propagation = (initial_lamps_through_propagation + total_prop_iters) / total_lamps
+            amt_lamps_through_init_propagation = (initial_lamps_through_propagation) / total_lamps
+            if difficulty == 1 and ((backtracks <= 4) or (depth <= 8) or (decision_points <= 8) or amt_lamps_through_propagation >= 0.5) and amt_lamps_through_init_propagation > 0.05:
+                    print(f'puzzle generated successfully for score {difficulty}')
+                    return True
+            elif difficulty == 2 and ((backtracks <= 8 and backtracks > 4) or (depth <= 16 and depth > 8) or (decision_points <= 16 and decision_points > 8) or (amt_lamps_through_propagation >= 0.1 and amt_lamps_through_propagation < 0.5)):
+                    print(f'puzzle generated successfully for score {difficulty}')
+                    return True
+            elif difficulty == 3 and ((backtracks > 8) or (depth > 16) or (decision_points > 16)):
+                    print(f'puzzle generated successfully for score {difficulty}')
+                    return True
+        return False
+
+    def solution_first_candidate(self, grid_size_x, grid_size_y) -> Akari:
+        # walls first, then a full lamp placement: every white cell in random order gets a lamp if no
+        # lamp lights it yet, so no two lamps see each other and every cell ends up lit. every wall
+        # is then numbered with the lamps around it, which makes the placement a solution
+        akari = Akari(grid_size_x, grid_size_y)
+        size = grid_size_x * grid_size_y
+        for i in self.rng.sample(range(size), self.rng.randint(size // 8, size // 3)):
+            akari.kinds[i] = BLACK
+        akari.invalidate_geometry()
+
+        state = SolutionState(akari, auto_find_cells_that_must_have_lamps=False)
+        white_cells = [i for i in range(size) if akari.kinds[i] != BLACK]
+        self.rng.shuffle(white_cells)
+        for i in white_cells:
+            if not state.is_lit(i):
+                state.assign(i, LAMP)
+
+        neighbors = akari.geometry.neighbors
+        for i in range(size):
+            if akari.kinds[i] == BLACK:
+                akari.clues[i] = sum(1 for n in neighbors[i] if state.values[n] == LAMP)
+        akari.invalidate_geometry()
+        return akari
+
+    def remove_redundant_clues(self, akari: Akari, share: float) -> int:
+        # try taking the number off share of the numbered walls, in random order, keeping each
+        # removal the puzzle stays unique without. taking a number off only ever adds solutions, so
+        # the puzzle is unique again afterwards if it was before. returns the numbers removed
+        numbered = [i for i in range(len(akari.clues)) if akari.clues[i] != NO_CLUE]
+        self.rng.shuffle(numbered)
+        removed = 0
+        for i in numbered[:round(len(numbered) * share)]:
+            number = akari.clues[i]
+            akari.clues[i] = NO_CLUE
+            akari.invalidate_geometry()
+            if count_solutions(akari, 2, dead_states=self.dead_states, stats=self.stats)[0] == 1:
+                removed += 1
+            else:
+                akari.clues[i] = number
+                akari.invalidate_geometry()
+        return removed
+
+    def solution_first_attempt(self, grid_size_x, grid_size_y, difficulty=1) -> Akari | None:
+        # a solution_first_candidate, made unique with repair_for_single_solution (all its walls are
+        # numbered, so that adds walls), stripped of numbers it doesn't need, and scored
+        timer = phase_timer(self.stats)
+        start = time.perf_counter() if timer else 0.0
+        akari = self.solution_first_candidate(grid_size_x, grid_size_y)
+        if timer:
+            timer.add_time('candidates', start)
+            start = time.perf_counter()
+        unique, solution = self.repair_for_single_solution(akari, prefer_walls=difficulty == 3)
+        if unique:
+            self.remove_redundant_clues(akari, CLUE_REMOVAL_SHARE[difficulty])
+        if timer:
+            timer.add_time('adjust', start)
+
+        if unique and self.matches_difficulty(akari, difficulty):
+            return akari
+        return None
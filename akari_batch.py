@@ -0,0 +1,114 @@
+import numpy as np
+
+from akari import Akari, SolutionState, LAMP, BLACK, NO_CLUE
+
+
+# arrays are indexed [puzzle, x, y] to match the (x, y) keys of Akari.cells
+
+def stack_puzzles(akaris: list[Akari]) -> tuple[np.ndarray, np.ndarray]:
+    # returns (black, clues) of shape (n, grid_size_x, grid_size_y). clues is -1 where there is no number
+    if not akaris:
+        raise ValueError('no puzzles to stack')
+    grid_size_x, grid_size_y = akaris[0].grid_size_x, akaris[0].grid_size_y
+    for akari in akaris:
+        if (akari.grid_size_x, akari.grid_size_y) != (grid_size_x, grid_size_y):
+            raise ValueError('all puzzles in a batch must have the same grid size')
+
+    kinds = np.frombuffer(b''.join(bytes(akari.kinds) for akari in akaris), dtype=np.uint8)
+    clues = np.frombuffer(b''.join(bytes(akari.clues) for akari in akaris), dtype=np.uint8)
+    shape = (len(akaris), grid_size_x, grid_size_y)
+    black = (kinds == BLACK).reshape(shape)
+    clues = np.where(clues == NO_CLUE, -1, clues.astype(np.int16)).reshape(shape)
+    return black, clues
+
+
+def stack_states(states: list[SolutionState]) -> np.ndarray:
+    # lamps of each state as a bool array of shape (n, grid_size_x, grid_size_y)
+    akari = states[0].akari
+    values = np.frombuffer(b''.join(bytes(state.values) for state in states), dtype=np.uint8)
+    return (values == LAMP).reshape((len(states), akari.grid_size_x, akari.grid_size_y))
+
+
+def lamps_from_cells(akaris: list[Akari], lamp_cells: list[set[tuple[int, int]]]) -> np.ndarray:
+    lamps = np.zeros((len(akaris), akaris[0].grid_size_x, akaris[0].grid_size_y), dtype=bool)
+    for n, cells in enumerate(lamp_cells):
+        for x, y in cells:
+            lamps[n, x, y] = True
+    return lamps
+
+
+def neighbor_counts(lamps: np.ndarray) -> np.ndarray:
+    # number of lamps orthogonally next to every cell, as a sum of the four shifted boards
+    padded = np.pad(lamps.astype(np.int8), ((0, 0), (1, 1), (1, 1)))
+    return padded[:, 2:, 1:-1] + padded[:, :-2, 1:-1] + padded[:, 1:-1, 2:] + padded[:, 1:-1, :-2]
+
+
+def segment_lamp_counts(lamps: np.ndarray, black: np.ndarray, axis: int) -> np.ndarray:
+    # lamps in the segment (run of white cells along axis) each cell belongs to. a running total
+    # of lamps is reset at every black cell by subtracting the total seen at the last black cell,
+    # once forwards and once backwards; the cell itself is in both halves
+    def running(lamps, black):
+        total = np.cumsum(lamps, axis=axis, dtype=np.int32)
+        return total - np.maximum.accumulate(np.where(black, total, 0), axis=axis)
+
+    lamps = lamps & ~black
+    forward = running(lamps, black)
+    backward = np.flip(running(np.flip(lamps, axis), np.flip(black, axis)), axis)
+    return forward + backward - lamps
+
+
+def evaluate_batch(black: np.ndarray, clues: np.ndarray, lamps: np.ndarray) -> dict[str, np.ndarray]:
+    # vectorized is_valid / is_solved for a stack of boards. every entry has one value per board:
+    #   valid           no clue has too many lamps, no lamp lights another, no lamp on a black cell
+    #   solved          valid, every clue satisfied and every white cell lit
+    #   unlit           white cells without a lamp that no lamp lights
+    #   clue_violations clues with more or fewer lamps than their number
+    #   over_clues      clues with more lamps than their number
+    #   lit_lamps       lamps lit by another lamp
+    white = ~black
+    numbered = clues >= 0
+
+    adjacent_lamps = neighbor_counts(lamps & white)
+    over = numbered & (adjacent_lamps > clues)
+    under = numbered & (adjacent_lamps < clues)
+
+    own = (lamps & white).astype(np.int32)
+    seen = segment_lamp_counts(lamps, black, 1) + segment_lamp_counts(lamps, black, 2) - 2 * own
+    lit = white & (seen > 0)
+
+    unlit = white & ~lamps & ~lit
+    lit_lamps = lamps & lit
+    lamps_on_black = lamps & black
+
+    axes = (1, 2)
+    over_clues = over.sum(axis=axes)
+    lit_lamp_counts = lit_lamps.sum(axis=axes)
+    valid = (over_clues == 0) & (lit_lamp_counts == 0) & ~lamps_on_black.any(axis=axes)
+    unlit_counts = unlit.sum(axis=axes)
+    clue_violations = over_clues + under.sum(axis=axes)
+
+    return {
+        'valid': valid,
+        'solved': valid & (clue_violations == 0) & (unlit_counts == 0),
+        'unlit': unlit_counts,
+        'clue_violations': clue_violations,
+        'over_clues': over_clues,
+        'lit_lamps': lit_lamp_counts,
+    }
+
+
+def evaluate_states(states: list[SolutionState]) -> dict[str, np.ndarray]:
+    black, clues = stack_puzzles([state.akari for state in states])
+    return evaluate_batch(black, clues, stack_states(states))
+
+
+def forced_lamps_conflict(akaris: list[Akari]) -> np.ndarray:
+    # bulk version of the cheap half of AkariGenerator.lamps_must_intersect: do the lamps forced
+    # by clues that have exactly as many white neighbours as their number already clash?
+    # a clue with exactly as many white neighbours as its number forces a lamp on every one of them,
+    # the same cells as Akari.must_have_lamp_indices without a solution
+    black, clues = stack_puzzles(akaris)
+    white = ~black
+    saturated = (clues >= 0) & (neighbor_counts(white) == clues)
+    lamps = white & (neighbor_counts(saturated) > 0)
+    return ~evaluate_batch(black, clues, lamps)['valid']
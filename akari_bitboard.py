@@ -0,0 +1,236 @@
+from akari import Akari, SolutionState, LAMP, NO_LAMP, BLACK
+
+
+def bits(mask: int):
+    # indices of the set bits of mask, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class BitboardPuzzle:
+    # an Akari layout as python int masks, bit i being cell index i (x * grid_size_y + y)
+    akari: Akari
+    white: int
+    black: int
+    near_clue: int
+    sight: list[int]
+    segment_masks: list[int]
+    clue_masks: list[tuple[int, int]]
+
+    def __init__(self, akari: Akari):
+        geometry = akari.geometry
+        self.akari = akari
+
+        self.white = 0
+        for i, kind in enumerate(akari.kinds):
+            if kind != BLACK:
+                self.white |= 1 << i
+        self.black = ((1 << geometry.size) - 1) & ~self.white
+
+        self.near_clue = 0
+        for i, near in enumerate(geometry.near_clue):
+            if near:
+                self.near_clue |= 1 << i
+
+        self.segment_masks = []
+        for segment in geometry.segments:
+            mask = 0
+            for i in segment:
+                mask |= 1 << i
+            self.segment_masks.append(mask)
+
+        # sight[i] is every cell a lamp on i lights, i included
+        self.sight = [0] * geometry.size
+        for i in range(geometry.size):
+            if geometry.row_segment[i] >= 0:
+                self.sight[i] = self.segment_masks[geometry.row_segment[i]] | self.segment_masks[geometry.column_segment[i]]
+
+        # (white neighbourhood, number) for every clue
+        self.clue_masks = []
+        for i in geometry.clue_cells:
+            mask = 0
+            for n in geometry.white_neighbors[i]:
+                mask |= 1 << n
+            self.clue_masks.append((mask, akari.clues[i]))
+
+    def illuminate(self, lamps: int) -> int:
+        lit = 0
+        for i in bits(lamps):
+            lit |= self.sight[i]
+        return lit
+
+    def numbered_cell_num_lamps(self, lamps: int, clue: int) -> int:
+        return (lamps & self.clue_masks[clue][0]).bit_count()
+
+    def is_valid(self, lamps: int) -> bool:
+        for mask, number in self.clue_masks:
+            if (lamps & mask).bit_count() > number:
+                return False
+        for segment in self.segment_masks:
+            if (lamps & segment).bit_count() > 1:
+                return False
+        return True
+
+    def is_solved(self, lamps: int) -> bool:
+        for mask, number in self.clue_masks:
+            if (lamps & mask).bit_count() != number:
+                return False
+        return self.is_valid(lamps) and self.illuminate(lamps) == self.white
+
+
+class BitboardSearch:
+    # the same depth first search as BacktrackingSearch, but a search state is just three ints:
+    # the lamps placed, the cells they light, and the cells ruled out for a lamp. a state is
+    # copied by keeping the tuple, so branches push their parent state instead of undoing
+    puzzle: BitboardPuzzle
+    max_depth: int | None
+    depth: int
+    total_prop_iters: int
+    total_check_iters: int
+    backtracks: int
+    decision_points: int
+
+    def __init__(self, puzzle: BitboardPuzzle, max_depth:int|None = None):
+        self.puzzle = puzzle
+        self.max_depth = max_depth
+        self.depth = 0
+        self.total_prop_iters = 0
+        self.total_check_iters = 0
+        self.backtracks = 0
+        self.decision_points = 0
+
+    def place_lamp(self, state: tuple[int, int, int], i: int) -> tuple[int, int, int] | None:
+        lamps, lit, forbidden = state
+        bit = 1 << i
+        if (lit | forbidden) & bit:
+            return None
+        return lamps | bit, lit | self.puzzle.sight[i], forbidden
+
+    def propagate(self, state: tuple[int, int, int]) -> tuple[tuple[int, int, int] | None, int, int]:
+        # apply clue and lighting deductions until nothing changes. returns the new state (None on a
+        # contradiction), the lamps placed and the unlit cells checked
+        puzzle = self.puzzle
+        white = puzzle.white
+        sight = puzzle.sight
+        prop_iters = 0
+        check_iters = 0
+
+        changed = True
+        while changed:
+            changed = False
+            lamps, lit, forbidden = state
+
+            for mask, number in puzzle.clue_masks:
+                placed = (lamps & mask).bit_count()
+                free = mask & ~lit & ~forbidden
+                if placed > number:
+                    return None, prop_iters, check_iters
+                if placed == number:
+                    if free:
+                        forbidden |= free
+                        changed = True
+                    continue
+                if placed + free.bit_count() < number:
+                    return None, prop_iters, check_iters
+                if placed + free.bit_count() == number:
+                    state = (lamps, lit, forbidden)
+                    for i in bits(free):
+                        placed_state = self.place_lamp(state, i)
+                        if placed_state is None:
+                            return None, prop_iters, check_iters
+                        state = placed_state
+                        prop_iters += 1
+                    lamps, lit, forbidden = state
+                    changed = True
+            state = (lamps, lit, forbidden)
+
+            # every unlit cell needs a cell in its segments that can still take a lamp
+            available = white & ~lit & ~forbidden
+            for i in bits(white & ~lit):
+                check_iters += 1
+                sources = sight[i] & available
+                if not sources:
+                    return None, prop_iters, check_iters
+                if sources & (sources - 1) == 0:
+                    placed_state = self.place_lamp(state, sources.bit_length() - 1)
+                    if placed_state is None:
+                        return None, prop_iters, check_iters
+                    state = placed_state
+                    prop_iters += 1
+                    changed = True
+                    break
+
+        return state, prop_iters, check_iters
+
+    def run(self, state: tuple[int, int, int]) -> tuple[int | None, int]:
+        # returns the solution's lamp mask (or None) and the lamps placed by the initial propagation
+        puzzle = self.puzzle
+        root, initial_prop_iters, check_iters = self.propagate(state)
+        if root is None:
+            return None, initial_prop_iters
+
+        # children are pushed unpropagated, lamp branch on top so it is explored first
+        stack: list[tuple[int, int, int] | None] = []
+        state = root
+        while True:
+            self.depth += 1
+            if self.max_depth and self.depth > self.max_depth:
+                return None, initial_prop_iters
+
+            lamps, lit, forbidden = state
+            candidates = puzzle.white & ~lit & ~forbidden
+            if not candidates:
+                if lit == puzzle.white and puzzle.is_solved(lamps):
+                    return lamps, initial_prop_iters
+                self.backtracks += 1
+            else:
+                if candidates & (candidates - 1):
+                    self.decision_points += 1
+                preferred = candidates & puzzle.near_clue or candidates
+                i = (preferred & -preferred).bit_length() - 1
+                stack.append((lamps, lit, forbidden | (1 << i)))
+                stack.append(self.place_lamp(state, i))
+
+            next_state = None
+            while stack and next_state is None:
+                child = stack.pop()
+                if child is not None:
+                    child, prop_iters, check_iters = self.propagate(child)
+                    self.total_prop_iters += prop_iters
+                    self.total_check_iters += check_iters
+                if child is None:
+                    self.backtracks += 1
+                next_state = child
+            if next_state is None:
+                return None, initial_prop_iters
+            state = next_state
+
+
+def initial_bitboard_state(puzzle: BitboardPuzzle, state: SolutionState | None) -> tuple[int, int, int]:
+    # carry over the lamps and ruled out cells of an existing SolutionState
+    lamps = 0
+    forbidden = 0
+    if state:
+        for i, value in enumerate(state.values):
+            if value == LAMP:
+                lamps |= 1 << i
+            elif value == NO_LAMP:
+                forbidden |= 1 << i
+    return lamps, puzzle.illuminate(lamps), forbidden & puzzle.white
+
+
+def solve_bitboard(akari: Akari, state: SolutionState | None = None, max_depth:int|None = None) -> tuple[SolutionState | None, int, int, int, int, int]:
+    puzzle = BitboardPuzzle(akari)
+    search = BitboardSearch(puzzle, max_depth)
+    lamps, initial_prop_iters = search.run(initial_bitboard_state(puzzle, state))
+
+    solution = None
+    if lamps is not None:
+        solution = SolutionState(akari, auto_find_cells_that_must_have_lamps=False)
+        for i in bits(lamps):
+            solution.assign(i, LAMP)
+        solution.initial_propogation_iterations = initial_prop_iters
+
+    return solution, search.depth, search.total_prop_iters, search.total_check_iters, search.backtracks, search.decision_points
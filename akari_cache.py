@@ -0,0 +1,276 @@
+import json, time, sqlite3, hashlib
+from typing import Callable, TYPE_CHECKING
+
+from akari import Akari, SolutionState, SolverStats, SOLVER_VERSION, BLACK, NO_CLUE
+from akari_parallel import state_from_values
+
+if TYPE_CHECKING:
+    from akari_rating import Rating
+
+
+# where the gui and solveAkariBatch.py keep their cache, next to the puzzles/ directory
+DEFAULT_CACHE_PATH = '.akari_cache.sqlite'
+
+DEFAULT_MAX_ENTRIES = 10000
+
+# how old an entry's last use can get before a read marks it used again. eviction only needs
+# the rough order, and a read that doesn't write doesn't wait on the other processes' writes
+USED_RESOLUTION = 60
+
+
+def symmetries(grid_size_x: int, grid_size_y: int) -> list[tuple[int, int, list[int]]]:
+    # the 4 rotations and 4 reflections of the grid, as (size x, size y, index map) where the index
+    # map takes each cell index to the cell's index in the turned grid. half of them swap x and y,
+    # so a 5x7 grid and its 7x5 transpose share a fingerprint
+    last_x = grid_size_x - 1
+    last_y = grid_size_y - 1
+    moves = [
+        (grid_size_x, grid_size_y, lambda x, y: (x, y)),
+        (grid_size_x, grid_size_y, lambda x, y: (last_x - x, y)),
+        (grid_size_x, grid_size_y, lambda x, y: (x, last_y - y)),
+        (grid_size_x, grid_size_y, lambda x, y: (last_x - x, last_y - y)),
+        (grid_size_y, grid_size_x, lambda x, y: (y, x)),
+        (grid_size_y, grid_size_x, lambda x, y: (last_y - y, x)),
+        (grid_size_y, grid_size_x, lambda x, y: (y, last_x - x)),
+        (grid_size_y, grid_size_x, lambda x, y: (last_y - y, last_x - x)),
+    ]
+    transforms = []
+    for size_x, size_y, move in moves:
+        index_map = []
+        for x in range(grid_size_x):
+            for y in range(grid_size_y):
+                moved_x, moved_y = move(x, y)
+                index_map.append(moved_x * size_y + moved_y)
+        transforms.append((size_x, size_y, index_map))
+    return transforms
+
+
+class Fingerprint:
+    # a puzzle's layout in its canonical orientation, the one of its 8 rotations and reflections
+    # with the smallest encoding. key is the same for all 8, index_map takes the puzzle's cell
+    # indices to the canonical orientation's. a symmetric puzzle has several canonical
+    # orientations, and any of them will do: it maps every solution onto a solution
+    key: str
+    index_map: list[int]
+
+    def __init__(self, akari: Akari):
+        # one byte per cell: 0 white, 1 wall, 2 + n a wall numbered n
+        cells = bytes(
+            0 if kind != BLACK else 1 if clue == NO_CLUE else 2 + clue
+            for kind, clue in zip(akari.kinds, akari.clues))
+
+        best = b''
+        for size_x, size_y, index_map in symmetries(akari.grid_size_x, akari.grid_size_y):
+            turned = bytearray(len(cells))
+            for i, cell in enumerate(cells):
+                turned[index_map[i]] = cell
+            encoding = size_x.to_bytes(2, 'big') + size_y.to_bytes(2, 'big') + turned
+            if not best or encoding < best:
+                best = encoding
+                self.index_map = index_map
+        self.key = hashlib.sha256(best).hexdigest()
+
+    def to_canonical(self, values: bytes | bytearray) -> bytes:
+        turned = bytearray(len(values))
+        for i, value in enumerate(values):
+            turned[self.index_map[i]] = value
+        return bytes(turned)
+
+    def from_canonical(self, values: bytes) -> bytes:
+        return bytes(values[j] for j in self.index_map)
+
+
+class ResultCache:
+    # results by fingerprint in a sqlite file, so every orientation of a puzzle shares one entry
+    # and every process pointed at the file shares them all. an entry is a json object filled in a
+    # piece at a time by whatever worked the puzzle out: 'solve' per solver settings, 'count' and
+    # 'rating'. solutions are kept as SolutionState values in the canonical orientation.
+    # the file is emptied when it was written by another SOLVER_VERSION, and past max_entries the
+    # least recently used entries are dropped
+    path: str
+    max_entries: int
+    hits: int
+    misses: int
+    connection: sqlite3.Connection
+
+    def __init__(self, path:str = DEFAULT_CACHE_PATH, max_entries:int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # a lost write only costs a search, so commits don't wait for the disk
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=OFF')
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS results (fingerprint TEXT PRIMARY KEY, entry TEXT, used REAL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+            row = self.connection.execute("SELECT value FROM meta WHERE name = 'solver_version'").fetchone()
+            if row is None or row[0] != str(SOLVER_VERSION):
+                self.connection.execute('DELETE FROM results')
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('solver_version', ?)", (str(SOLVER_VERSION),))
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def entry(self, key: str) -> dict:
+        # the entry for a fingerprint, empty if there is none. marks it as used when it wasn't
+        # in the last USED_RESOLUTION seconds
+        row = self.connection.execute('SELECT entry, used FROM results WHERE fingerprint = ?', (key,)).fetchone()
+        if row is None:
+            return {}
+        now = time.time()
+        if row[1] < now - USED_RESOLUTION:
+            self.connection.execute('UPDATE results SET used = ? WHERE fingerprint = ?', (now, key))
+        return json.loads(row[0])
+
+    def update(self, key: str, name: str, value, setting: str | None = None):
+        # sets one piece of an entry, or with setting one value in that piece, reading the entry
+        # in the same transaction so a piece or setting another process added in the meantime is kept
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            row = self.connection.execute('SELECT entry FROM results WHERE fingerprint = ?', (key,)).fetchone()
+            entry = json.loads(row[0]) if row else {}
+            if setting is None:
+                entry[name] = value
+            else:
+                entry.setdefault(name, {})[setting] = value
+            self.connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?)', (key, json.dumps(entry), time.time()))
+            if row is None:
+                self.evict()
+
+    def evict(self):
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self.connection.execute('DELETE FROM results WHERE fingerprint IN (SELECT fingerprint FROM results ORDER BY used LIMIT ?)', (excess,))
+
+    def clear(self):
+        self.connection.execute('DELETE FROM results')
+
+    def close(self):
+        self.connection.close()
+
+    def stats(self) -> dict[str, int]:
+        return {'entries': len(self), 'hits': self.hits, 'misses': self.misses}
+
+
+# caches opened in this process, by path, for the worker processes of solveAkariBatch.py and
+# akari_parallel.generation_attempt
+open_caches: dict[str, ResultCache] = {}
+
+
+def open_cache(path: str, max_entries:int = DEFAULT_MAX_ENTRIES) -> ResultCache:
+    cache = open_caches.get(path)
+    if cache is None:
+        cache = open_caches[path] = ResultCache(path, max_entries)
+    return cache
+
+
+def solve_settings(engine: str, heuristic: str, backjumping: bool, decompose: bool, dead_states: bool, split: bool) -> str:
+    # the solve() arguments its counters depend on. the solution found may differ between them too.
+    # a shared DeadStateTable prunes what it has seen before and a split search adds up the
+    # counters of its subproblems, so both are kept apart from a plain search
+    if engine != 'backtracking':
+        return engine
+    return f'{engine} {heuristic}{" backjumping" if backjumping else ""}{" decompose" if decompose else ""}{" dead_states" if dead_states else ""}{" split" if split else ""}'
+
+
+def run_with_stats(stats: dict[str, int | str] | SolverStats | None, run: Callable[[dict[str, int | str] | SolverStats], tuple]) -> tuple[tuple, dict[str, int | str]]:
+    # run(search stats) with stats of its own, added to stats afterwards. returns run's result and
+    # the counters to cache for it
+    if isinstance(stats, SolverStats):
+        search_stats = SolverStats(stats.enabled, stats.node_hooks)
+        result = run(search_stats)
+        stats.merge(search_stats)
+        counters: dict[str, int | str] = dict(search_stats.counters)
+        # and the heuristic the search counted, so a hit counts it too
+        for heuristic in search_stats.heuristics:
+            counters['heuristic'] = heuristic
+    else:
+        counters = {}
+        result = run(counters)
+        if stats is not None:
+            stats.update(counters)
+    return result, counters
+
+
+def cached_solve(cache: ResultCache, akari: Akari, settings: str, stats: dict[str, int | str] | SolverStats | None, run: Callable[[dict[str, int | str] | SolverStats], tuple]) -> tuple[SolutionState | None, int, int, int, int, int]:
+    # solve()'s tuple for akari from the cache, or from run(stats) which is then cached. stats gets
+    # the counters either way, the phase times only when the search is run
+    fingerprint = Fingerprint(akari)
+    found = cache.entry(fingerprint.key).get('solve', {}).get(settings)
+    if found is not None:
+        cache.hits += 1
+        if stats is not None:
+            stats.update(found['stats'])
+        solution = None
+        if found['values'] is not None:
+            solution = state_from_values(akari, fingerprint.from_canonical(bytes.fromhex(found['values'])), found['initial_prop_iters'])
+        return (solution, *found['counters'])
+
+    cache.misses += 1
+    result, counters = run_with_stats(stats, run)
+    solution = result[0]
+    cache.update(fingerprint.key, 'solve', {
+        'values': fingerprint.to_canonical(solution.values).hex() if solution else None,
+        'initial_prop_iters': solution.initial_propogation_iterations if solution else 0,
+        'counters': list(result[1:]),
+        'stats': counters,
+    }, settings)
+    return result
+
+
+def cached_count(cache: ResultCache, akari: Akari, limit: int, settings: str, stats: dict[str, int | str] | SolverStats | None, run: Callable[[dict[str, int | str] | SolverStats], tuple[int, list[SolutionState]]]) -> tuple[int, list[SolutionState]]:
+    # count_solutions()'s result for akari from the cache, or from run(stats) which is then cached. a
+    # cached count answers any limit up to the one it was counted to, and any limit at all once it
+    # came in under its own (the count is exact then). the counters are kept per limit and settings
+    # (see solve_settings), and stats gets them either way: a count that would answer but has no
+    # counters for the stats asked for is run again
+    fingerprint = Fingerprint(akari)
+    entry = cache.entry(fingerprint.key)
+    found = entry.get('count')
+    answers = found is not None and (limit <= found['limit'] or found['count'] < found['limit'])
+    run_settings = f'{limit} {settings}'
+    counters = entry.get('count_stats', {}).get(run_settings)
+    if found is not None and answers and (stats is None or counters is not None):
+        cache.hits += 1
+        if stats is not None and counters is not None:
+            stats.update(counters)
+        solutions = [state_from_values(akari, fingerprint.from_canonical(bytes.fromhex(values))) for values in found['solutions'][:limit]]
+        return min(found['count'], limit), solutions
+
+    cache.misses += 1
+    (count, solutions), counters = run_with_stats(stats, run)
+    if not answers:
+        cache.update(fingerprint.key, 'count', {
+            'limit': limit,
+            'count': count,
+            'solutions': [fingerprint.to_canonical(solution.values).hex() for solution in solutions],
+        })
+    cache.update(fingerprint.key, 'count_stats', counters, run_settings)
+    return count, solutions
+
+
+def cached_rating(cache: ResultCache, akari: Akari, max_tier: int | None, run: Callable[[], 'Rating']) -> 'Rating':
+    # akari_rating.rate()'s result for akari from the cache, or from run() which is then cached. a
+    # full rating answers any max_tier at or above its tier, a stopped one only the same max_tier.
+    # a full rating is never replaced by a stopped one
+    from akari_rating import Rating
+    key = Fingerprint(akari).key
+    found = cache.entry(key).get('rating')
+    if found is not None and ((not found['stopped'] and (max_tier is None or found['tier'] <= max_tier)) or (found['stopped'] and found['max_tier'] == max_tier)):
+        cache.hits += 1
+        rating = Rating()
+        rating.tier = found['tier']
+        rating.steps = {int(tier): count for tier, count in found['steps'].items()}
+        rating.solved = found['solved']
+        rating.stopped = found['stopped']
+        return rating
+
+    cache.misses += 1
+    rating = run()
+    if found is None or found['stopped'] or not rating.stopped:
+        cache.update(key, 'rating', {'max_tier': max_tier, 'tier': rating.tier, 'steps': rating.steps, 'solved': rating.solved, 'stopped': rating.stopped})
+    return rating
@@ -0,0 +1,239 @@
+import multiprocessing, random, time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from akari import Akari, SolutionState, BacktrackingSearch, AkariGenerator, SolverStats, BRANCHING_HEURISTICS, LAMP, NO_LAMP
+
+
+# the search is split into about this many subproblems whatever the number of workers, so the
+# subproblems, and with them the results, are the same for any worker count
+SPLIT_TARGET = 32
+
+# the lowest subproblem index whose result is still needed, shared with every worker process
+cutoff = None
+
+# puzzles rebuilt in a worker process, by layout
+worker_puzzles: dict[tuple, Akari] = {}
+
+
+def layout_of(akari: Akari) -> tuple[int, int, bytes, bytes]:
+    return akari.grid_size_x, akari.grid_size_y, bytes(akari.kinds), bytes(akari.clues)
+
+
+def akari_from_layout(layout: tuple[int, int, bytes, bytes]) -> Akari:
+    grid_size_x, grid_size_y, kinds, clues = layout
+    akari = Akari(grid_size_x, grid_size_y)
+    akari.kinds[:] = kinds
+    akari.clues[:] = clues
+    akari.invalidate_geometry()
+    return akari
+
+
+def state_from_values(akari: Akari, values: bytes, initial_prop_iters:int = 0) -> SolutionState:
+    state = SolutionState(akari, auto_find_cells_that_must_have_lamps=False)
+    state.values = bytearray(values)
+    state.recount()
+    state.is_solved()
+    state.initial_propogation_iterations = initial_prop_iters
+    return state
+
+
+def split(state: SolutionState, search: BacktrackingSearch, target:int = SPLIT_TARGET) -> list[SolutionState]:
+    # expand the first decisions of the search level by level until there are at least target open
+    # nodes. each node is replaced by its lamp child then its no lamp child, so the list stays in
+    # the order a single search would visit the nodes in. nodes with nothing left to decide, and
+    # every node once the split reaches the search's max_depth, are kept as they are, dead
+    # children are dropped
+    choose_cell = BRANCHING_HEURISTICS[search.heuristic]
+    nodes = [state]
+    while len(nodes) < target:
+        expanded = []
+        for node in nodes:
+            if not node.free_cells or (search.max_depth and search.depth >= search.max_depth):
+                expanded.append(node)
+                continue
+            search.depth += 1
+            if node.free_cells > 1:
+                search.decision_points += 1
+            cell = choose_cell(node, None)
+            for value in (LAMP, NO_LAMP):
+                child = node.copy()
+                child.assign(cell, value)
+                if child.is_valid():
+                    search.total_prop_iters += child.propagate_constraints([cell])
+                    if not child.contradiction:
+                        ok, check_iters = child.forward_check()
+                        search.total_check_iters += check_iters
+                        if ok:
+                            expanded.append(child)
+                            continue
+                search.backtracks += 1
+        if expanded == nodes:
+            break
+        nodes = expanded
+    return nodes
+
+
+def set_cutoff(shared):
+    global cutoff
+    cutoff = shared
+
+
+def search_subproblem(layout: tuple[int, int, bytes, bytes], values: bytes, index: int, limit: int, options: dict) -> tuple[int, list[bytes], dict[str, int], bool]:
+    # runs in a worker: search one subproblem for up to limit solutions, giving up as soon as the
+    # parent has settled the answer from subproblems before this one
+    akari = worker_puzzles.get(layout)
+    if akari is None:
+        akari = worker_puzzles[layout] = akari_from_layout(layout)
+
+    search = BacktrackingSearch(options['max_depth'], heuristic=options['heuristic'], backjumping=options['backjumping'], decompose=options['decompose'])
+    shared = cutoff
+    if shared is not None:
+        search.should_stop = lambda: shared.value < index
+    solutions = search.run_all(state_from_values(akari, values), limit)
+    return index, [bytes(solution.values) for solution in solutions], search.counters(), search.stopped
+
+
+def search_parallel(
+            akari: Akari, \
+            state: SolutionState | None, \
+            limit: int, \
+            workers: int, \
+            max_depth:int|None = None, \
+            heuristic: str = 'clue_first', \
+            backjumping: bool = True, \
+            decompose: bool = True \
+
+    ) -> tuple[list[SolutionState], dict[str, int]]:
+    # the first limit solutions in the order a single search over the split would find them, and
+    # the search counters summed over the split and every subproblem up to the last one needed.
+    # subproblems after that are cancelled, or stop themselves at their next should_stop check.
+    # max_depth is a budget for the whole search, as it is for a single one: each subproblem gets
+    # an even share of what the split left of it. a subproblem that runs out of its share finds
+    # nothing, so within a budget the solutions found can differ from a single search's
+    if not state:
+        state = SolutionState(akari)
+
+    search = BacktrackingSearch(max_depth, heuristic=heuristic, backjumping=backjumping)
+    nodes = split(state, search)
+    share = None
+    if max_depth and nodes:
+        # a search gives up on the node past its max_depth, so each share is one short of its part
+        share = (max_depth + 1 - search.depth) // len(nodes) - 1
+        if share < 1:
+            # the split used up the budget
+            nodes = []
+    options = {'max_depth': share, 'heuristic': heuristic, 'backjumping': backjumping, 'decompose': decompose}
+    layout = layout_of(akari)
+
+    shared = multiprocessing.Value('q', len(nodes))
+    results: dict[int, tuple[list[bytes], dict[str, int], bool]] = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=set_cutoff, initargs=(shared,)) as pool:
+        futures = {pool.submit(search_subproblem, layout, bytes(node.values), index, limit, options): index for index, node in enumerate(nodes)}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if not future.cancelled():
+                    index, found, stats, stopped = future.result()
+                    results[index] = found, stats, stopped
+
+            # once the finished subproblems up to some index hold limit solutions, nothing after
+            # that index can change the answer
+            found_so_far = 0
+            for index in sorted(results):
+                if index > shared.value:
+                    break
+                if not results[index][2]:
+                    found_so_far += len(results[index][0])
+                if found_so_far >= limit:
+                    with shared.get_lock():
+                        shared.value = min(shared.value, index)
+                    break
+            for future in pending:
+                if futures[future] > shared.value:
+                    future.cancel()
+
+    totals = search.counters()
+    solutions = []
+    for index in range(min(shared.value + 1, len(nodes))):
+        found, stats, _ = results[index]
+        for key, value in stats.items():
+            if key == 'regions':
+                totals[key] = max(totals[key], value)
+            else:
+                totals[key] += value
+        for values in found[:limit - len(solutions)]:
+            solutions.append(state_from_values(akari, values, state.initial_propogation_iterations))
+    return solutions, totals
+
+
+def generation_attempt(grid_size_x: int, grid_size_y: int, difficulty: int, batch_size: int | None, seed: str, options: dict) -> tuple[tuple[int, int, bytes, bytes] | None, SolverStats]:
+    # runs in a worker: one AkariGenerator.generate_attempt with its own seed and a fresh generator,
+    # so what an attempt does doesn't depend on which worker ran it or what ran there before.
+    # the seed goes to the generator's own rng, the random module is left as it was
+    cache = None
+    if options['cache']:
+        from akari_cache import open_cache
+        cache = open_cache(*options['cache'])
+    generator = AkariGenerator(stats=SolverStats(enabled=options['timed']), repair=options['repair'], construction=options['construction'], rating=options['rating'], cache=cache, rng=random.Random(seed))
+    akari = generator.generate_attempt(grid_size_x, grid_size_y, difficulty, batch_size)
+    return (layout_of(akari) if akari else None), generator.stats
+
+
+def generate_parallel(
+            generator: AkariGenerator, \
+            grid_size_x: int, \
+            grid_size_y: int, \
+            difficulty: int, \
+            batch_size: int | None, \
+            workers: int, \
+            seed: int | None = None \
+
+    ) -> Akari:
+    # attempt n is seeded with (seed, n) and the puzzle returned is the one from the lowest
+    # numbered attempt that succeeds, so a given seed gives the same puzzle for any number of
+    # workers. attempts are kept a few per worker ahead of the ones finished, and once attempt n
+    # succeeds only the ones before it are still waited for, the others are cancelled
+    if seed is None:
+        seed = generator.rng.randrange(2**32)
+    in_flight = 2 * workers
+    options = {'timed': generator.stats.enabled, 'repair': generator.repair, 'construction': generator.construction, 'rating': generator.rating,
+               'cache': (generator.cache.path, generator.cache.max_entries) if generator.cache else None}
+    start = time.perf_counter()
+
+    found: int | None = None
+    layouts: dict[int, tuple[int, int, bytes, bytes]] = {}
+    attempts = 0
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = {}
+        next_attempt = 0
+        while True:
+            while found is None and len(futures) < in_flight:
+                future = pool.submit(generation_attempt, grid_size_x, grid_size_y, difficulty, batch_size, f'{seed}-{next_attempt}', options)
+                futures[future] = next_attempt
+                next_attempt += 1
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = futures.pop(future)
+                if future.cancelled():
+                    continue
+                layout, stats = future.result()
+                attempts += 1
+                generator.stats.merge(stats)
+                if layout is not None:
+                    layouts[index] = layout
+                    if found is None or index < found:
+                        found = index
+
+            if found is not None:
+                for future, index in list(futures.items()):
+                    if index > found and future.cancel():
+                        del futures[future]
+                if all(index > found for index in futures.values()):
+                    generator.report_attempts(attempts, time.perf_counter() - start)
+                    return akari_from_layout(layouts[found])
+    finally:
+        # attempts already running can't be interrupted, they are left to finish in the background
+        pool.shutdown(wait=False, cancel_futures=True)
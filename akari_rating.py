@@ -0,0 +1,278 @@
+import itertools
+from typing import TYPE_CHECKING
+
+from akari import Akari, SolutionState, LAMP, NO_LAMP, UNASSIGNED
+
+if TYPE_CHECKING:
+    from akari_cache import ResultCache
+
+
+# deduction tiers, easiest first. a puzzle's rating is the highest tier its easiest line of
+# deductions needs, or SEARCH when even probing gets stuck and only guessing would go on
+CLUE_SATURATION = 1
+SEGMENT_EXCLUSION = 2
+CLUE_PATTERNS = 3
+CONTRADICTION_PROBING = 4
+SEARCH = 5
+
+TIER_NAMES = {
+    CLUE_SATURATION: 'clue saturation',
+    SEGMENT_EXCLUSION: 'segment exclusion',
+    CLUE_PATTERNS: 'clue patterns',
+    CONTRADICTION_PROBING: 'contradiction probing',
+    SEARCH: 'search',
+}
+
+# the tiers that make up each generator difficulty
+DIFFICULTY_TIERS = {
+    1: (CLUE_SATURATION, SEGMENT_EXCLUSION),
+    2: (CLUE_PATTERNS, CLUE_PATTERNS),
+    3: (CONTRADICTION_PROBING, SEARCH),
+}
+
+
+class Rating:
+    # tier is the highest tier needed, steps[tier] the cells that tier decided. with stopped, the
+    # rater gave up as soon as it needed tier (above max_tier), so the steps are incomplete
+    tier: int
+    steps: dict[int, int]
+    solved: bool
+    stopped: bool
+
+    def __init__(self):
+        self.tier = 0
+        self.steps = {tier: 0 for tier in TIER_NAMES}
+        self.solved = False
+        self.stopped = False
+
+    def __str__(self):
+        steps = ', '.join(f'{TIER_NAMES[tier]}: {count}' for tier, count in self.steps.items() if count)
+        return f'{TIER_NAMES.get(self.tier, "none")}{" (stopped)" if self.stopped else ""} [{steps}]'
+
+
+class DeductionRater:
+    # solves a puzzle the way a person would, with the easiest deduction that still gets somewhere,
+    # starting over from the easiest after every step:
+    #   clue saturation       a clue with all its lamps has no more, one with exactly as many free
+    #                         neighbours as missing lamps gets them all
+    #   segment exclusion     a dark cell only one free cell can light gets a lamp there, and a cell
+    #                         that sees both of the only two cells that can light some dark cell
+    #                         can't hold a lamp
+    #   clue patterns         every way to place the missing lamps of one clue, or two clues sharing
+    #                         a free neighbour: cells that are the same in all of them, and cells lit
+    #                         by all of them, are decided
+    #   contradiction probing a value for a free cell that the three tiers above lead to a
+    #                         contradiction from means the cell gets the other one
+    # a cell is free while it is unassigned and unlit, like in SolutionState
+    akari: Akari
+    state: SolutionState
+
+    def __init__(self, akari: Akari):
+        self.akari = akari
+        self.state = SolutionState(akari, auto_find_cells_that_must_have_lamps=False)
+        self.state.start_trail()
+
+    def is_free(self, i: int) -> bool:
+        return self.state.values[i] == UNASSIGNED and self.state.is_dark(i)
+
+    def free_neighbors(self, c: int) -> list[int]:
+        if not self.state.clue_free[c]:
+            return []
+        return [n for n in self.state.geometry.white_neighbors[c] if self.is_free(n)]
+
+    def sources(self, i: int) -> list[int]:
+        # the free cells that could still light i, i included
+        return [j for j in (i,) + self.state.geometry.light_sources(i) if self.is_free(j)]
+
+    def sees(self, i: int, j: int) -> bool:
+        state = self.state
+        return state.row_segment[i] == state.row_segment[j] or state.column_segment[i] == state.column_segment[j]
+
+    def is_contradicted(self) -> bool:
+        # dark cells nothing can light any more are found by forward_check, which only looks at
+        # segments that ran out of free cells since it last ran. a probe runs it before undoing its
+        # assignments, so whatever it leaves behind is stale, never unchecked
+        state = self.state
+        if state.over_clues or state.crowded_segments:
+            return True
+        clues = self.akari.clues
+        for c in state.geometry.clue_cells:
+            if state.clue_lamps[c] + state.clue_free[c] < clues[c]:
+                return True
+        return not state.forward_check()[0]
+
+    def apply(self, deductions: dict[int, int]) -> int:
+        # assigns every deduction still open, returns how many that was
+        applied = 0
+        for i, value in deductions.items():
+            if self.is_free(i):
+                self.state.assign(i, value)
+                applied += 1
+        return applied
+
+    def clue_saturation(self) -> dict[int, int]:
+        state = self.state
+        clues = self.akari.clues
+        deductions = {}
+        for c in state.geometry.clue_cells:
+            free = self.free_neighbors(c)
+            if not free:
+                continue
+            missing = clues[c] - state.clue_lamps[c]
+            if missing == 0:
+                deductions.update((n, NO_LAMP) for n in free)
+            elif missing == len(free):
+                deductions.update((n, LAMP) for n in free)
+        return deductions
+
+    def segment_exclusion(self) -> dict[int, int]:
+        state = self.state
+        geometry = state.geometry
+        deductions = {}
+        row_segment = state.row_segment
+        column_segment = state.column_segment
+        segment_free = state.segment_free
+        for i in range(len(state.values)):
+            # at most three free cells in its segments is at most two sources, as a free i counts twice
+            row = row_segment[i]
+            if row < 0 or segment_free[row] + segment_free[column_segment[i]] > 3:
+                continue
+            if not state.is_dark(i) or state.values[i] == LAMP or state.support(i) > 2:
+                continue
+            sources = self.sources(i)
+            if len(sources) == 1:
+                deductions[sources[0]] = LAMP
+            elif len(sources) == 2:
+                first, second = sources
+                for j in (first,) + geometry.light_sources(first):
+                    if j not in sources and j != i and self.is_free(j) and self.sees(j, second) and not self.sees(j, i):
+                        deductions[j] = NO_LAMP
+        return deductions
+
+    def placements(self, clue_cells: list[int]) -> tuple[list[int], list[tuple[int, ...]]]:
+        # the free neighbours of the clues and every set of them that gives each clue exactly its
+        # missing lamps without two lamps seeing each other
+        state = self.state
+        clues = self.akari.clues
+        cells = sorted({n for c in clue_cells for n in self.free_neighbors(c)})
+        missing = {c: clues[c] - state.clue_lamps[c] for c in clue_cells}
+        neighbors = {c: set(self.free_neighbors(c)) for c in clue_cells}
+
+        placements = []
+        for size in range(len(cells) + 1):
+            for lamps in itertools.combinations(cells, size):
+                if any(len(neighbors[c].intersection(lamps)) != missing[c] for c in clue_cells):
+                    continue
+                if any(self.sees(a, b) for a, b in itertools.combinations(lamps, 2)):
+                    continue
+                placements.append(lamps)
+        return cells, placements
+
+    def clue_patterns(self) -> dict[int, int]:
+        state = self.state
+        geometry = state.geometry
+        clues = self.akari.clues
+        open_clues = [c for c in geometry.clue_cells if clues[c] != state.clue_lamps[c] and self.free_neighbors(c)]
+
+        groups = [[c] for c in open_clues]
+        for c, d in itertools.combinations(open_clues, 2):
+            if set(self.free_neighbors(c)) & set(self.free_neighbors(d)):
+                groups.append([c, d])
+
+        deductions = {}
+        for group in groups:
+            cells, placements = self.placements(group)
+            if not placements:
+                # no way to satisfy these clues, which probing is the tier to notice
+                continue
+            for n in cells:
+                chosen = [n in lamps for lamps in placements]
+                if all(chosen):
+                    deductions[n] = LAMP
+                elif not any(chosen):
+                    deductions[n] = NO_LAMP
+
+            # free cells outside the group that every placement lights
+            lit = None
+            for lamps in placements:
+                placement_lit = set()
+                for n in lamps:
+                    placement_lit.update(geometry.light_sources(n))
+                lit = placement_lit if lit is None else lit & placement_lit
+            for n in lit or ():
+                if n not in cells and self.is_free(n):
+                    deductions[n] = NO_LAMP
+        return deductions
+
+    def propagate(self, max_tier: int) -> bool:
+        # the tiers up to max_tier until none of them gets anywhere. false on a contradiction
+        tiers = [self.clue_saturation, self.segment_exclusion, self.clue_patterns][:max_tier]
+        progress = True
+        while progress:
+            if self.is_contradicted():
+                return False
+            progress = False
+            for tier in tiers:
+                if self.apply(tier()):
+                    progress = True
+                    break
+        return not self.is_contradicted()
+
+    def contradiction_probing(self) -> dict[int, int]:
+        state = self.state
+        for i in range(len(state.values)):
+            if not self.is_free(i):
+                continue
+            for value, other in ((LAMP, NO_LAMP), (NO_LAMP, LAMP)):
+                mark = state.mark()
+                state.assign(i, value)
+                consistent = self.propagate(CLUE_PATTERNS)
+                state.undo(mark)
+                if not consistent:
+                    return {i: other}
+        return {}
+
+    def rate(self, max_tier:int|None = None) -> Rating:
+        # with max_tier, stops as soon as a step needs a higher tier than that
+        rating = Rating()
+        tiers = [
+            (CLUE_SATURATION, self.clue_saturation),
+            (SEGMENT_EXCLUSION, self.segment_exclusion),
+            (CLUE_PATTERNS, self.clue_patterns),
+            (CONTRADICTION_PROBING, self.contradiction_probing),
+        ]
+        state = self.state
+        while state.free_cells and not self.is_contradicted():
+            for tier, deduce in tiers:
+                if max_tier is not None and tier > max_tier:
+                    rating.tier = tier
+                    rating.stopped = True
+                    return rating
+                applied = self.apply(deduce())
+                if applied:
+                    rating.steps[tier] += applied
+                    rating.tier = max(rating.tier, tier)
+                    break
+            else:
+                rating.tier = SEARCH
+                if max_tier is not None and SEARCH > max_tier:
+                    rating.stopped = True
+                return rating
+
+        rating.solved = state.free_cells == 0 and state.is_solved()
+        return rating
+
+
+def rate(akari: Akari, max_tier:int|None = None, cache: 'ResultCache | None' = None) -> Rating:
+    # with cache, a rating of the same layout from before is used if it answers max_tier too
+    if cache is not None:
+        from akari_cache import cached_rating
+        return cached_rating(cache, akari, max_tier, lambda: DeductionRater(akari).rate(max_tier))
+    return DeductionRater(akari).rate(max_tier)
+
+
+def rate_difficulty(akari: Akari, difficulty: int, cache: 'ResultCache | None' = None) -> bool:
+    # does the puzzle need exactly the tiers of difficulty? stops rating once it needs a harder tier
+    low, high = DIFFICULTY_TIERS[difficulty]
+    rating = rate(akari, high if high < SEARCH else None, cache)
+    return not rating.stopped and low <= rating.tier <= high
@@ -0,0 +1,449 @@
+import heapq
+
+from akari import Akari, SolutionState, LAMP, NO_LAMP, BLACK
+
+
+def luby(i: int) -> int:
+    # i-th term (from 0) of the luby sequence 1 1 2 1 1 2 4 1 1 2 ..., used to space out restarts
+    size, exponent = 1, 0
+    while size < i + 1:
+        exponent += 1
+        size = 2 * size + 1
+    while size - 1 != i:
+        size = (size - 1) // 2
+        exponent -= 1
+        i %= size
+    return 2 ** exponent
+
+
+class CDCLSolver:
+    # a small conflict driven clause learning SAT solver. literals are non-zero ints as in DIMACS:
+    # v means variable v is true, -v that it is false. clauses are watched by their first two
+    # literals, conflicts are analysed down to the first unique implication point, variables are
+    # picked by activity (VSIDS) with saved phases, and the search restarts on a luby schedule.
+    # solve() can be called again after adding more clauses, which is how solutions are enumerated
+    num_vars: int
+    ok: bool
+    clauses: list[list[int]]
+    learnts: list[list[int]]
+    watches: list[list[list[int]]]
+    values: list[int]
+    levels: list[int]
+    reasons: list[list[int] | None]
+    trail: list[int]
+    trail_lim: list[int]
+    head: int
+    activity: list[float]
+    var_inc: float
+    phase: list[bool]
+    order: list[tuple[float, int]]
+    model: list[bool] | None
+
+    decisions: int
+    propagations: int
+    clause_checks: int
+    conflicts: int
+    restarts: int
+
+    var_decay = 0.95
+    restart_base = 100
+
+    def __init__(self):
+        self.num_vars = 0
+        self.ok = True
+        self.clauses = []
+        self.learnts = []
+        # watches[2 * v] holds the clauses watching v, watches[2 * v + 1] those watching -v
+        self.watches = [[], []]
+        self.values = [0]
+        self.levels = [0]
+        self.reasons = [None]
+        self.trail = []
+        self.trail_lim = []
+        self.head = 0
+        self.activity = [0.0]
+        self.var_inc = 1.0
+        self.phase = [False]
+        self.order = []
+        self.model = None
+
+        self.decisions = 0
+        self.propagations = 0
+        self.clause_checks = 0
+        self.conflicts = 0
+        self.restarts = 0
+
+    def new_var(self) -> int:
+        self.num_vars += 1
+        self.watches += [[], []]
+        self.values.append(0)
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phase.append(False)
+        heapq.heappush(self.order, (0.0, self.num_vars))
+        return self.num_vars
+
+    def watch_index(self, literal: int) -> int:
+        return 2 * literal if literal > 0 else -2 * literal + 1
+
+    def value(self, literal: int) -> int:
+        # 1 if the literal is true, -1 if it is false, 0 if its variable is unassigned
+        value = self.values[abs(literal)]
+        return value if literal > 0 else -value
+
+    def decision_level(self) -> int:
+        return len(self.trail_lim)
+
+    def add_clause(self, literals: list[int]) -> bool:
+        # clauses can only be added between searches. returns False once the clauses are unsatisfiable
+        if not self.ok:
+            return False
+        self.cancel_until(0)
+
+        clause = []
+        for literal in literals:
+            value = self.value(literal)
+            if value == 1 or -literal in clause:
+                return True
+            if value == 0 and literal not in clause:
+                clause.append(literal)
+
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.enqueue(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.clauses.append(clause)
+            self.attach(clause)
+        return self.ok
+
+    def attach(self, clause: list[int]):
+        self.watches[self.watch_index(clause[0])].append(clause)
+        self.watches[self.watch_index(clause[1])].append(clause)
+
+    def enqueue(self, literal: int, reason: list[int] | None):
+        v = abs(literal)
+        self.values[v] = 1 if literal > 0 else -1
+        self.levels[v] = len(self.trail_lim)
+        self.reasons[v] = reason
+        self.trail.append(literal)
+
+    def propagate(self) -> list[int] | None:
+        # unit propagation over the watched literals. returns a conflicting clause, or None
+        values = self.values
+        watches = self.watches
+        trail = self.trail
+        watch_index = self.watch_index
+
+        while self.head < len(trail):
+            false_literal = -trail[self.head]
+            self.head += 1
+            self.propagations += 1
+
+            watching = watches[watch_index(false_literal)]
+            i = j = 0
+            count = len(watching)
+            while i < count:
+                clause = watching[i]
+                i += 1
+                self.clause_checks += 1
+
+                # keep the false literal in the second slot
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], false_literal
+                first = clause[0]
+                first_value = values[abs(first)] if first > 0 else -values[abs(first)]
+                if first_value == 1:
+                    watching[j] = clause
+                    j += 1
+                    continue
+
+                for k in range(2, len(clause)):
+                    literal = clause[k]
+                    if (values[abs(literal)] if literal > 0 else -values[abs(literal)]) != -1:
+                        clause[1], clause[k] = literal, false_literal
+                        watches[watch_index(literal)].append(clause)
+                        break
+                else:
+                    watching[j] = clause
+                    j += 1
+                    if first_value == -1:
+                        while i < count:
+                            watching[j] = watching[i]
+                            j += 1
+                            i += 1
+                        del watching[j:]
+                        return clause
+                    self.enqueue(first, clause)
+            del watching[j:]
+
+        return None
+
+    def bump(self, v: int):
+        self.activity[v] += self.var_inc
+        if self.activity[v] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.var_inc *= 1e-100
+            self.order = [(-self.activity[u], u) for u in range(1, self.num_vars + 1) if not self.values[u]]
+            heapq.heapify(self.order)
+        elif not self.values[v]:
+            heapq.heappush(self.order, (-self.activity[v], v))
+
+    def analyze(self, conflict: list[int]) -> tuple[list[int], int]:
+        # walk the trail back from the conflict to the first literal of the current level that every
+        # path to it passes through. returns the learnt clause, asserting literal first, and the
+        # level to jump back to
+        levels = self.levels
+        level = self.decision_level()
+        seen = set()
+        learnt = [0]
+        pending = 0
+        index = len(self.trail) - 1
+        clause = conflict
+        literal = 0
+
+        while True:
+            for q in (clause if not literal else clause[1:]):
+                v = abs(q)
+                if v not in seen and levels[v] > 0:
+                    seen.add(v)
+                    self.bump(v)
+                    if levels[v] == level:
+                        pending += 1
+                    else:
+                        learnt.append(q)
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            reason = self.reasons[abs(literal)]
+            seen.discard(abs(literal))
+            pending -= 1
+            # only the first uip can be a decision, every literal before it was implied
+            if not pending or reason is None:
+                break
+            clause = reason
+        learnt[0] = -literal
+
+        # drop literals implied by the others already in the clause
+        minimized = [learnt[0]]
+        for q in learnt[1:]:
+            reason = self.reasons[abs(q)]
+            if reason is None or any(abs(r) not in seen and levels[abs(r)] > 0 for r in reason[1:]):
+                minimized.append(q)
+        learnt = minimized
+
+        backjump = 0
+        if len(learnt) > 1:
+            deepest = max(range(1, len(learnt)), key=lambda k: levels[abs(learnt[k])])
+            learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+            backjump = levels[abs(learnt[1])]
+        self.var_inc /= self.var_decay
+        return learnt, backjump
+
+    def cancel_until(self, level: int):
+        if self.decision_level() <= level:
+            return
+        values = self.values
+        start = self.trail_lim[level]
+        for literal in self.trail[start:]:
+            v = abs(literal)
+            self.phase[v] = values[v] > 0
+            values[v] = 0
+            self.reasons[v] = None
+            heapq.heappush(self.order, (-self.activity[v], v))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.head = len(self.trail)
+
+    def pick_branch_variable(self) -> int:
+        order = self.order
+        while order:
+            v = heapq.heappop(order)[1]
+            if not self.values[v]:
+                return v
+        return 0
+
+    def solve(self, max_decisions: int | None = None) -> bool | None:
+        # True with the assignment in self.model, False if there is no solution, None if
+        # max_decisions (counted over the solver's whole life) ran out first
+        if not self.ok:
+            return False
+
+        restart_conflicts = self.restart_base * luby(self.restarts)
+        conflicts_since_restart = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts_since_restart += 1
+                if not self.decision_level():
+                    self.ok = False
+                    return False
+
+                learnt, backjump = self.analyze(conflict)
+                self.cancel_until(backjump)
+                if len(learnt) == 1:
+                    self.enqueue(learnt[0], None)
+                else:
+                    self.learnts.append(learnt)
+                    self.attach(learnt)
+                    self.enqueue(learnt[0], learnt)
+
+                if conflicts_since_restart >= restart_conflicts:
+                    self.restarts += 1
+                    restart_conflicts = self.restart_base * luby(self.restarts)
+                    conflicts_since_restart = 0
+                    self.cancel_until(0)
+                continue
+
+            v = self.pick_branch_variable()
+            if not v:
+                self.model = [value > 0 for value in self.values]
+                return True
+            if max_decisions is not None and self.decisions >= max_decisions:
+                self.cancel_until(0)
+                return None
+
+            self.decisions += 1
+            self.trail_lim.append(len(self.trail))
+            self.enqueue(v if self.phase[v] else -v, None)
+
+
+def add_at_most(solver: CDCLSolver, literals: list[int], k: int):
+    # cardinality constraint sum(literals) <= k. small ones are spelled out pairwise, larger ones go
+    # through a sequential counter (Sinz 2005): partial[i][j] is true once more than j of the first
+    # i + 1 literals are true
+    n = len(literals)
+    if k < 0:
+        # nothing satisfies it, which is the empty clause
+        solver.ok = False
+        return
+    if k >= n:
+        return
+    if k == 0:
+        for literal in literals:
+            solver.add_clause([-literal])
+        return
+    if k == 1 and n <= 5:
+        for a in range(n):
+            for b in range(a + 1, n):
+                solver.add_clause([-literals[a], -literals[b]])
+        return
+
+    partial = [[solver.new_var() for _ in range(k)] for _ in range(n - 1)]
+    solver.add_clause([-literals[0], partial[0][0]])
+    for j in range(1, k):
+        solver.add_clause([-partial[0][j]])
+    for i in range(1, n - 1):
+        solver.add_clause([-literals[i], partial[i][0]])
+        solver.add_clause([-partial[i - 1][0], partial[i][0]])
+        for j in range(1, k):
+            solver.add_clause([-literals[i], -partial[i - 1][j - 1], partial[i][j]])
+            solver.add_clause([-partial[i - 1][j], partial[i][j]])
+        solver.add_clause([-literals[i], -partial[i - 1][k - 1]])
+    solver.add_clause([-literals[n - 1], -partial[n - 2][k - 1]])
+
+
+def add_at_least(solver: CDCLSolver, literals: list[int], k: int):
+    if k <= 0:
+        return
+    if k > len(literals):
+        solver.ok = False
+        return
+    if k == 1:
+        solver.add_clause(literals)
+        return
+    add_at_most(solver, [-literal for literal in literals], len(literals) - k)
+
+
+def add_exactly(solver: CDCLSolver, literals: list[int], k: int):
+    add_at_most(solver, literals, k)
+    add_at_least(solver, literals, k)
+
+
+class SatEncoding:
+    # an Akari puzzle as clauses over one variable per white cell (a lamp there):
+    #   at most one lamp in every row / column segment
+    #   every white cell has a lamp in one of its two segments
+    #   every clue has exactly its number of lamps around it
+    akari: Akari
+    solver: CDCLSolver
+    cell_vars: dict[int, int]
+
+    def __init__(self, akari: Akari, state: SolutionState | None = None):
+        geometry = akari.geometry
+        self.akari = akari
+        self.solver = CDCLSolver()
+        self.cell_vars = {}
+        for i, kind in enumerate(akari.kinds):
+            if kind != BLACK:
+                self.cell_vars[i] = self.solver.new_var()
+        lamp = self.cell_vars
+
+        for segment in geometry.segments:
+            add_at_most(self.solver, [lamp[i] for i in segment], 1)
+        for i in lamp:
+            sources = geometry.segments[geometry.row_segment[i]] + geometry.segments[geometry.column_segment[i]]
+            self.solver.add_clause([lamp[j] for j in sorted(set(sources))])
+        for i in geometry.clue_cells:
+            add_exactly(self.solver, [lamp[n] for n in geometry.white_neighbors[i]], akari.clues[i])
+
+        # carry over the lamps and ruled out cells of an existing SolutionState
+        if state:
+            for i, var in lamp.items():
+                if state.values[i] == LAMP:
+                    self.solver.add_clause([var])
+                elif state.values[i] == NO_LAMP:
+                    self.solver.add_clause([-var])
+
+    def forced_lamps(self) -> int:
+        # lamps fixed by unit propagation alone, before any decision
+        if self.solver.propagate() is not None:
+            self.solver.ok = False
+        return sum(1 for var in self.cell_vars.values() if self.solver.value(var) == 1)
+
+    def lamp_cells(self) -> list[int]:
+        model = self.solver.model
+        if model is None:
+            raise ValueError('the solver has no solution to read lamps from')
+        return [i for i, var in self.cell_vars.items() if model[var]]
+
+    def solution(self) -> SolutionState:
+        solution = SolutionState(self.akari, auto_find_cells_that_must_have_lamps=False)
+        for i in self.lamp_cells():
+            solution.assign(i, LAMP)
+        return solution
+
+    def block_solution(self):
+        # no other solution can hold every lamp of this one, as any extra lamp would share a segment
+        # with one of them, so forbidding this exact set of lamps is enough
+        self.solver.add_clause([-self.cell_vars[i] for i in self.lamp_cells()])
+
+
+def solve_sat(akari: Akari, state: SolutionState | None = None, max_depth:int|None = None) -> tuple[SolutionState | None, int, int, int, int, int]:
+    # same return shape as solve(): depth and decision_points are the solver's decisions (max_depth
+    # caps them), total_prop_iters the literals propagated, total_check_iters the clauses visited
+    # while propagating and backtracks the conflicts
+    encoding = SatEncoding(akari, state)
+    solver = encoding.solver
+    initial_prop_iters = encoding.forced_lamps() if solver.ok else 0
+
+    solution = None
+    if solver.solve(max_depth):
+        solution = encoding.solution()
+        solution.initial_propogation_iterations = initial_prop_iters
+
+    return solution, solver.decisions, solver.propagations, solver.clause_checks, solver.conflicts, solver.decisions
+
+
+def count_solutions_sat(akari: Akari, limit:int = 2, state: SolutionState | None = None, max_depth:int|None = None) -> tuple[int, list[SolutionState]]:
+    # count_solutions() on the SAT backend: each solution found is blocked and the solver asked again
+    encoding = SatEncoding(akari, state)
+    solutions = []
+    while len(solutions) < limit and encoding.solver.solve(max_depth):
+        solutions.append(encoding.solution())
+        encoding.block_solution()
+    return len(solutions), solutions
@@ -0,0 +1,220 @@
+import os, sys, gc, time, json, platform, statistics, tracemalloc
+from argparse import ArgumentParser
+
+from akari import Akari, solve, solve_basic, AkariGenerator
+
+
+# puzzle sets under puzzles/ that are benchmarked by default
+PUZZLE_SETS = ['steve', 'light_up_online', 'submission']
+
+BASELINE_VERSION = 1
+
+
+def run_solve(akari: Akari, stats: dict[str, int | str]):
+    return solve(akari, stats=stats)[0]
+
+
+def run_solve_basic(akari: Akari, stats: dict[str, int | str]):
+    return solve_basic(akari, stats=stats)[0]
+
+
+def run_unique(akari: Akari, stats: dict[str, int | str]):
+    # a fresh generator every run, so no run starts with dead states left over from the one before
+    return AkariGenerator().check_unique_solution(akari, stats=stats)
+
+
+BENCHMARKS = {
+    'solve': run_solve,
+    'solve_basic': run_solve_basic,
+    'unique': run_unique,
+}
+
+
+class Case:
+    # one puzzle of the corpus. group is the puzzle set and difficulty it is reported under
+    puzzle: str
+    group: str
+    size: str
+
+    def __init__(self, puzzle: str):
+        self.puzzle = puzzle
+        parts = puzzle.split('/')
+        if len(parts) > 2:
+            self.group = '/'.join(parts[:2])
+        else:
+            # submission/akari_hard_1 and the like carry their difficulty in the name
+            difficulty = next((word for word in parts[-1].split('_') if word in ('easy', 'normal', 'hard')), '')
+            self.group = f'{parts[0]}/{difficulty}' if difficulty else parts[0]
+        akari = self.load()
+        self.size = f'{akari.grid_size_x}x{akari.grid_size_y}'
+
+    def load(self) -> Akari:
+        akari = Akari()
+        akari.load_from_file(os.path.abspath(os.path.join('puzzles', self.puzzle)))
+        return akari
+
+
+def find_cases(puzzle_sets: list[str]) -> list[Case]:
+    cases = []
+    for puzzle_set in puzzle_sets:
+        for root, dirs, files in os.walk(os.path.join('puzzles', puzzle_set)):
+            dirs.sort()
+            for name in sorted(files):
+                cases.append(Case(os.path.relpath(os.path.join(root, name), 'puzzles').replace(os.sep, '/')))
+    return cases
+
+
+def measure(case: Case, benchmark: str, repeat: int, warmup: int) -> dict:
+    # every run gets a freshly loaded puzzle, so each one pays for the same work, geometry included.
+    # the garbage collector is off while a run is timed, as timeit does. peak memory is taken from
+    # one more run under tracemalloc, which would slow the timed runs down
+    run = BENCHMARKS[benchmark]
+    for _ in range(warmup):
+        run(case.load(), {})
+
+    times = []
+    stats: dict[str, int | str] = {}
+    for _ in range(repeat):
+        akari = case.load()
+        stats = {}
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run(akari, stats)
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    akari = case.load()
+    tracemalloc.start()
+    try:
+        run(akari, {})
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'group': case.group,
+        'size': case.size,
+        'time': statistics.median(times),
+        'time_min': min(times),
+        'time_mean': statistics.fmean(times),
+        'time_stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'nodes': stats['depth'],
+        'backtracks': stats['backtracks'],
+        'peak_memory': peak_memory,
+    }
+
+
+def run_benchmarks(cases: list[Case], benchmarks: list[str], repeat: int, warmup: int) -> dict[str, dict]:
+    # results keyed by 'benchmark puzzle'
+    results = {}
+    for benchmark in benchmarks:
+        for case in cases:
+            results[f'{benchmark} {case.puzzle}'] = measure(case, benchmark, repeat, warmup)
+    return results
+
+
+def report(results: dict[str, dict], out=sys.stdout):
+    # totals per benchmark, group and size
+    rows: dict[tuple[str, str, str], list[dict]] = {}
+    for key, result in results.items():
+        benchmark = key.split(' ', 1)[0]
+        rows.setdefault((benchmark, result['group'], result['size']), []).append(result)
+
+    print(f'{"benchmark":<12} {"group":<24} {"size":>7} {"cases":>5} {"time (ms)":>10} {"nodes":>8} {"backtracks":>10} {"peak (KiB)":>10}', file=out)
+    for (benchmark, group, size), group_results in rows.items():
+        print(
+            f'{benchmark:<12} {group:<24} {size:>7} {len(group_results):>5}'
+            f' {sum(result["time"] for result in group_results) * 1000:>10.2f}'
+            f' {sum(result["nodes"] for result in group_results):>8}'
+            f' {sum(result["backtracks"] for result in group_results):>10}'
+            f' {max(result["peak_memory"] for result in group_results) / 1024:>10.1f}',
+            file=out)
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float, min_time: float, min_memory: int) -> list[str]:
+    # a run regresses when its median time or peak memory grows past tolerance (and by more than
+    # the noise floor min_time / min_memory), or when it searches more nodes or backtracks more.
+    # the counters don't depend on the machine, so they get no tolerance
+    regressions = []
+    for key, result in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        if result['time'] > old['time'] * (1 + tolerance) and result['time'] - old['time'] > min_time:
+            regressions.append(f'{key}: time {old["time"] * 1000:.2f}ms -> {result["time"] * 1000:.2f}ms')
+        if result['peak_memory'] > old['peak_memory'] * (1 + tolerance) and result['peak_memory'] - old['peak_memory'] > min_memory:
+            regressions.append(f'{key}: peak memory {old["peak_memory"]} -> {result["peak_memory"]} bytes')
+        for counter in ('nodes', 'backtracks'):
+            if result[counter] > old[counter]:
+                regressions.append(f'{key}: {counter} {old[counter]} -> {result[counter]}')
+    return regressions
+
+
+def load_baseline(filename: str) -> dict[str, dict]:
+    with open(filename) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get('version') != BASELINE_VERSION:
+        raise ValueError(f'{filename} is not a version {BASELINE_VERSION} baseline')
+    return baseline['results']
+
+
+def save_baseline(filename: str, results: dict[str, dict], repeat: int, warmup: int):
+    with open(filename, 'w') as baseline_file:
+        json.dump({
+            'version': BASELINE_VERSION,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'warmup': warmup,
+            'results': results,
+        }, baseline_file, indent=1)
+
+
+parser = ArgumentParser(
+                prog='benchmarkAkari.py',
+                description='Times the solvers over the bundled puzzles and compares the results to a saved baseline')
+parser.add_argument('sets', nargs='*', default=PUZZLE_SETS, help=f'Puzzle sets under puzzles/ to run (default is {" ".join(PUZZLE_SETS)})')
+parser.add_argument('-b', '--benchmark', action='append', choices=sorted(BENCHMARKS), help='Solver to run, can be repeated (default is all of them)')
+parser.add_argument('-r', '--repeat', type=int, default=5, help='Timed runs per puzzle (default is 5)')
+parser.add_argument('-w', '--warmup', type=int, default=1, help='Untimed runs per puzzle before the timed ones (default is 1)')
+parser.add_argument('-s', '--save', required=False, help='File to save the results to as a baseline')
+parser.add_argument('-c', '--compare', required=False, help='Baseline file to compare the results to')
+parser.add_argument('-t', '--tolerance', type=float, default=0.25, help='Allowed relative growth of time and peak memory (default is 0.25)')
+parser.add_argument('--min-time', type=float, default=0.002, help='Time differences in seconds below this are noise (default is 0.002)')
+parser.add_argument('--min-memory', type=int, default=64 * 1024, help='Peak memory differences in bytes below this are noise (default is 65536)')
+
+
+def main(argv=None) -> int:
+    args = parser.parse_args(argv)
+    # puzzles are found relative to the repository like everywhere else, baselines relative to
+    # where the command was run
+    for name in ('save', 'compare'):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    results = run_benchmarks(find_cases(args.sets), args.benchmark or list(BENCHMARKS), args.repeat, args.warmup)
+    report(results)
+
+    if args.save:
+        save_baseline(args.save, results, args.repeat, args.warmup)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance, args.min_time, args.min_memory)
+        missing = sorted(set(results) - set(baseline))
+        if missing:
+            print(f'{len(missing)} runs are not in the baseline', file=sys.stderr)
+        for regression in regressions:
+            print(f'regression: {regression}', file=sys.stderr)
+        if regressions:
+            return 1
+        print(f'no regressions against {args.compare}', file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
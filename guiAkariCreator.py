@@ -3,7 +3,8 @@ import random, copy, time, enum
 from tkinter import simpledialog
 from argparse import ArgumentParser
 
-from akari import Cell, Akari, SolutionState, solve, AkariGenerator
+from akari import Cell, Akari, SolutionState, SolverStats, solve, AkariGenerator
+from akari_cache import ResultCache, DEFAULT_CACHE_PATH
 
 
 class GuiMode(enum.Enum):
@@ -16,8 +17,10 @@ class AkariEditor:
     akari: Akari
     mode: GuiMode
     
-    def __init__(self, master, load_from_file=None, cell_size=40):
+    def __init__(self, master, load_from_file=None, cell_size=40, cache=None):
         self.master = master
+        # solves, uniqueness checks and generated puzzles go through this akari_cache.ResultCache
+        self.cache = cache
         self.highlighted_cell = None
         self.cell_size = cell_size  # Visual size of cells in pixels
         self.mode = GuiMode.CREATE if not load_from_file else GuiMode.SOLVE
@@ -305,6 +308,9 @@ class AkariEditor:
                 self.akari.cells[self.highlighted_cell.coords()].number = None
             else:
                 self.akari.cells[self.highlighted_cell.coords()].number = number
+            if self.solution_state:
+                # the state's clue counters were built for the old numbers
+                self.solution_state.update_illuminated_cells()
             self.redraw_all()
             
     def toggle_number(self):
@@ -316,6 +322,8 @@ class AkariEditor:
             else:
                 self.canvas.delete(f"{self.highlighted_cell.coords()}-number")
                 self.akari.cells[self.highlighted_cell.coords()].number = None
+            if self.solution_state:
+                self.solution_state.update_illuminated_cells()
         else:
             self.message.config(text="No cell highlighted.")
         self.redraw_all()
@@ -323,7 +331,8 @@ class AkariEditor:
     def solve_push(self):
         if self.solution_state:
             self.remove_solution()
-        solution, depth, total_prop_iters, total_check_iters, backtracks, decision_points = solve(self.akari)
+        stats = SolverStats()
+        solution, depth, total_prop_iters, total_check_iters, backtracks, decision_points = solve(self.akari, stats=stats, cache=self.cache)
         if solution:
             self.message.config(text=f'Solved.')
             # print(f'solved: in {depth} steps with {total_prop_iters} propogation iterations and {total_check_iters} forward check iterations and {backtracks} backtracks and {decision_points} decision points')
@@ -335,7 +344,13 @@ class AkariEditor:
         total_check_iters: {total_check_iters}
         backtracks: {backtracks}
         decision_points: {decision_points}
+        backjumps: {stats['backjumps']} ({stats['skipped_levels']} levels skipped)
+        nogoods: {stats['nogoods']} ({stats['nogood_prunes']} prunes)
             """)
+            for phase, seconds in sorted(stats.phase_times.items(), key=lambda item: -item[1]):
+                print(f'        {phase}: {seconds * 1000:.2f}ms')
+            if self.cache:
+                print(f'        cache: {self.cache.hits} hits, {self.cache.misses} misses')
             self.solution_state = solution
             self.redraw_all()
         else:
@@ -343,12 +358,12 @@ class AkariEditor:
             
     def check_unique_push(self):
         if self.solution_state and self.solution_state.is_solved():
-            unique, solution = AkariGenerator().check_unique_solution(self.akari, find_solution_different_than=self.solution_state)
+            unique, solution = AkariGenerator(cache=self.cache).check_unique_solution(self.akari, find_solution_different_than=self.solution_state)
             if solution:
                 self.solution_state = solution
                 self.redraw_all()
         else:
-            unique, solution = AkariGenerator().check_unique_solution(self.akari)
+            unique, solution = AkariGenerator(cache=self.cache).check_unique_solution(self.akari)
         if solution:
             if unique:
                 self.message.config(text="This puzzle has a unique solution!")
@@ -364,7 +379,8 @@ class AkariEditor:
         self.message.config(text="Generating...")
         difficulty = simpledialog.askinteger("Input", "Enter difficulty (1-3):", parent=self.master, minvalue=1, maxvalue=3)
         if difficulty:
-            akari = AkariGenerator().generate_akari_puzzle(self.akari.grid_size_x, self.akari.grid_size_y, difficulty)
+            workers = int(args.workers) if args.workers else None
+            akari = AkariGenerator(construction=args.construction, cache=self.cache).generate_akari_puzzle(self.akari.grid_size_x, self.akari.grid_size_y, difficulty, workers=workers)
             if akari:
                 self.akari = akari
                 self.message.config(text="Generated.")
@@ -399,6 +415,10 @@ parser = ArgumentParser(
                 description='Edits, saves, and solves Akari puzzles')
 parser.add_argument('-f','--filename', required=False, help='The filename of the puzzle to load from') 
 parser.add_argument('-s','--size', required=False, help='The cell size to use (default is 40, range is 20-60)') 
+parser.add_argument('-w','--workers', required=False, help='Number of processes to generate puzzles with (default is 1)') 
+parser.add_argument('--construction', choices=['random', 'solution_first'], default='random', help='How Generate builds candidates: random boards, or boards built around a solution (default is random)') 
+parser.add_argument('-c','--cache', default=DEFAULT_CACHE_PATH, help=f'File to cache solver results in (default is {DEFAULT_CACHE_PATH})') 
+parser.add_argument('--no-cache', dest='use_cache', action='store_false', help='Solve everything from scratch without the cache') 
 args = parser.parse_args()
 
 
@@ -407,7 +427,8 @@ def main():
     root.title("Akari Editor")
     file = args.filename if args.filename else None
     cell_size = int(args.size) if args.size else 40
-    app = AkariEditor(root, load_from_file=file, cell_size=cell_size)
+    cache = ResultCache(args.cache) if args.use_cache else None
+    app = AkariEditor(root, load_from_file=file, cell_size=cell_size, cache=cache)
     root.mainloop()
 
 
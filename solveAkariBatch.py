@@ -0,0 +1,144 @@
+import os, sys, time, json, csv
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+
+from akari import Akari, solve, count_solutions, BRANCHING_HEURISTICS
+
+
+# the columns of every result, in output order. the six counters are the ones the gui prints
+FIELDS = [
+    'file', 'grid_size_x', 'grid_size_y', 'solved', 'unique', 'time',
+    'initial_prop_iters', 'depth', 'total_prop_iters', 'total_check_iters', 'backtracks', 'decision_points',
+    'solution', 'error',
+]
+
+
+def find_puzzles(paths: list[str]) -> list[str]:
+    # files are taken as they are, directories are walked in sorted order
+    puzzles = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                puzzles.extend(os.path.join(root, name) for name in sorted(files))
+        else:
+            puzzles.append(path)
+    return puzzles
+
+
+def solve_file(path: str, options: dict) -> dict:
+    # load, solve and (unless turned off) check one puzzle for a second solution. runs in a worker
+    result = dict.fromkeys(FIELDS)
+    result['file'] = path
+    try:
+        akari = Akari()
+        # an absolute path keeps load_from_file from putting it under puzzles/
+        akari.load_from_file(os.path.abspath(path))
+        result['grid_size_x'], result['grid_size_y'] = akari.grid_size_x, akari.grid_size_y
+        cache = None
+        if options['cache']:
+            from akari_cache import open_cache
+            cache = open_cache(options['cache'])
+
+        start = time.perf_counter()
+        solution, depth, total_prop_iters, total_check_iters, backtracks, decision_points = solve(akari, max_depth=options['max_depth'], engine=options['engine'], heuristic=options['heuristic'], cache=cache)
+        result['time'] = round(time.perf_counter() - start, 6)
+        result['solved'] = bool(solution and solution.is_solved())
+        result.update(depth=depth, total_prop_iters=total_prop_iters, total_check_iters=total_check_iters, backtracks=backtracks, decision_points=decision_points)
+
+        if solution:
+            result['initial_prop_iters'] = solution.initial_propogation_iterations
+            result['solution'] = sorted(solution.assigned_lamps())
+            if options['unique']:
+                # no max_depth here: a count it cuts short is only a lower bound, and a puzzle
+                # with two solutions would come out unique
+                engine = 'sat' if options['engine'] == 'sat' else 'backtracking'
+                count = count_solutions(akari, 2, heuristic=options['heuristic'], engine=engine, cache=cache)[0]
+                result['unique'] = count == 1
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    return result
+
+
+def results(puzzles: list[str], options: dict, workers: int):
+    # results in the order of puzzles, each yielded as soon as it and everything before it is done
+    if workers <= 1:
+        for path in puzzles:
+            yield solve_file(path, options)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(solve_file, puzzles, [options] * len(puzzles))
+
+
+class JsonLinesWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, result: dict):
+        self.out.write(json.dumps(result) + '\n')
+        self.out.flush()
+
+
+class CsvWriter:
+    def __init__(self, out):
+        self.out = out
+        self.writer = csv.DictWriter(out, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def write(self, result: dict):
+        row = dict(result)
+        if row['solution'] is not None:
+            row['solution'] = ' '.join(f'{x},{y}' for x, y in row['solution'])
+        self.writer.writerow(row)
+        self.out.flush()
+
+
+WRITERS = {
+    'jsonl': JsonLinesWriter,
+    'csv': CsvWriter,
+}
+
+
+parser = ArgumentParser(
+                prog='solveAkariBatch.py',
+                description='Solves every Akari puzzle in some files or directories without the gui, one result per line')
+parser.add_argument('paths', nargs='*', default=['puzzles'], help='Puzzle files or directories to walk (default is puzzles)')
+parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='Number of worker processes (default is one per cpu)')
+parser.add_argument('-f', '--format', choices=sorted(WRITERS), default='jsonl', help='Output format (default is jsonl)')
+parser.add_argument('-o', '--output', required=False, help='File to write the results to (default is stdout)')
+parser.add_argument('-e', '--engine', choices=['backtracking', 'bitboard', 'sat'], default='backtracking', help='Solving engine (default is backtracking)')
+parser.add_argument('--heuristic', choices=sorted(BRANCHING_HEURISTICS), default='clue_first', help='Branching heuristic of the backtracking engine')
+parser.add_argument('--max-depth', type=int, required=False, help='Give up on solving a puzzle after this many search steps, the uniqueness check is never cut short')
+parser.add_argument('--cache', required=False, help='File to cache results in, so a puzzle solved before (in any rotation or reflection) is looked up instead')
+parser.add_argument('--no-unique', dest='unique', action='store_false', help='Skip the check for a second solution')
+
+
+def main(argv=None) -> int:
+    args = parser.parse_args(argv)
+    puzzles = find_puzzles(args.paths)
+    options = {'engine': args.engine, 'heuristic': args.heuristic, 'max_depth': args.max_depth, 'unique': args.unique,
+               'cache': os.path.abspath(args.cache) if args.cache else None}
+
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    writer = WRITERS[args.format](out)
+    solved = failed = not_unique = 0
+    start = time.perf_counter()
+    try:
+        for result in results(puzzles, options, args.workers):
+            writer.write(result)
+            if result['solved']:
+                solved += 1
+            else:
+                failed += 1
+            if result['unique'] is False:
+                not_unique += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f'{len(puzzles)} puzzles: {solved} solved, {failed} failed, {not_unique} not unique in {time.perf_counter() - start:.2f}s', file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,509 @@
-from akari import Maze
+import os, random
 
+from akari import Akari, SolutionState, DeadStateTable, SolverStats, AkariGenerator, solve, solve_basic, count_solutions, BRANCHING_HEURISTICS, LAMP, NO_LAMP, UNASSIGNED, BLACK, NO_CLUE
 
 
-def run():
-    newmaze = Maze()
-    newmaze.load_from_file("maze00")
-    solution = newmaze.solve_bfs()
-    return solution
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+PUZZLES = [
+    os.path.relpath(os.path.join(root, name), 'puzzles')
+    for root, dirs, files in os.walk('puzzles')
+    for name in sorted(files)
+    if name != 'test'
+]
+
+
+def load(puzzle) -> Akari:
+    akari = Akari()
+    akari.load_from_file(puzzle)
+    return akari
+
+
+def lit_by_walking_rays(state: SolutionState):
+    # reference illumination computed the way the solver originally did it
+    akari = state.akari
+    lit = set()
+    for (x, y), value in state.lamps.items():
+        if not value:
+            continue
+        for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            i, j = x + dx, y + dy
+            while (i, j) in akari.cells and not akari.cells[(i, j)].is_black:
+                lit.add((i, j))
+                i, j = i + dx, j + dy
+    return lit
+
+
+def test_incremental_illumination_matches_full_recompute():
+    rng = random.Random(539)
+    for puzzle in PUZZLES:
+        akari = load(puzzle)
+        state = SolutionState(akari, auto_find_cells_that_must_have_lamps=False)
+        white = [i for i, kind in enumerate(akari.kinds) if kind != BLACK]
+        for _ in range(200):
+            state.assign(rng.choice(white), rng.choice((LAMP, LAMP, NO_LAMP, UNASSIGNED)))
+
+            recomputed = state.copy()
+            recomputed.update_illuminated_cells()
+            assert state.segment_lamps == recomputed.segment_lamps, puzzle
+            for counter in ('clue_lamps', 'clue_free', 'segment_free', 'free_cells', 'over_clues', 'unsatisfied_clues', 'crowded_segments', 'dark_cells', 'hash'):
+                assert getattr(state, counter) == getattr(recomputed, counter), (puzzle, counter)
+
+            # a copy, so the original keeps every segment that ran out of free cells along the way
+            dead = any(state.is_dark(i) and not any(state.values[j] == UNASSIGNED and state.is_dark(j) for j in (i,) + state.geometry.light_sources(i))
+                       for i in white)
+            assert state.copy().forward_check()[0] == (not dead), puzzle
+
+        assert {key for key, lit in state.illuminated_cells.items() if lit} == lit_by_walking_rays(state), puzzle
+
+
+def test_bitboard_engine_matches_backtracking():
+    for puzzle in PUZZLES:
+        akari = load(puzzle)
+        solution = solve(akari)[0]
+        bitboard_solution = solve(akari, engine='bitboard')[0]
+        assert solution and bitboard_solution and bitboard_solution.is_solved(), puzzle
+        assert bitboard_solution.assigned_lamps() == solution.assigned_lamps(), puzzle
+
+
+def test_backjumping_keeps_solutions():
+    for puzzle in PUZZLES:
+        akari = load(puzzle)
+        stats = {}
+        solution = solve(akari, stats=stats)[0]
+        plain = solve(akari, backjumping=False)[0]
+        assert solution is not None and plain is not None, puzzle
+        assert solution.assigned_lamps() == plain.assigned_lamps(), puzzle
+        assert stats['skipped_levels'] >= stats['backjumps'] >= 0, puzzle
+
+
+def test_dead_state_table_is_reused_across_searches():
+    akari = load('light_up_online/hard/4848983')
+    dead_states = DeadStateTable()
+    first, second = {}, {}
+    solution = solve(akari, stats=first, dead_states=dead_states)[0]
+    assert first['dead_states_recorded'] > 0
+    again = solve(akari, stats=second, dead_states=dead_states)[0]
+    assert solution is not None and again is not None
+    assert again.assigned_lamps() == solution.assigned_lamps()
+    assert second['dead_state_hits'] > 0 and second['depth'] < first['depth']
+    assert count_solutions(akari, limit=10, dead_states=dead_states)[0] == 1
+
+    small = DeadStateTable(max_bytes=5 * DeadStateTable.entry_bytes)
+    for key in range(20):
+        small.add(key)
+    assert len(small) == 5 and small.evictions == 15
+    assert 19 in small and 0 not in small
+    assert (small.hits, small.misses) == (1, 1)
+
+
+def test_sat_engine_solves():
+    for puzzle in PUZZLES:
+        akari = load(puzzle)
+        solution = solve(akari, engine='sat')[0]
+        assert solution and solution.is_solved(), puzzle
+
+    # a clue above its number of white neighbours can't be satisfied, which is no solution
+    akari = Akari(3, 3)
+    akari.cells[(0, 0)].is_black = True
+    akari.cells[(0, 0)].number = 3
+    assert solve(akari, engine='sat')[0] is None and count_solutions(akari, engine='sat')[0] == 0
+
+    rng = random.Random(13)
+    for _ in range(100):
+        akari = Akari(5, 5)
+        for i in rng.sample(range(25), rng.randint(3, 10)):
+            akari.kinds[i] = BLACK
+            akari.clues[i] = rng.choice([NO_CLUE, 0, 1, 2, 3, 4])
+        akari.invalidate_geometry()
+        assert count_solutions(akari, engine='sat')[0] == count_solutions(akari)[0]
+
+
+def test_every_branching_heuristic_solves():
+    for puzzle in PUZZLES:
+        akari = load(puzzle)
+        for heuristic in BRANCHING_HEURISTICS:
+            stats = {}
+            solution = solve(akari, heuristic=heuristic, stats=stats)[0]
+            assert solution and solution.is_solved(), (puzzle, heuristic)
+            assert stats['heuristic'] == heuristic, (puzzle, heuristic)
+
+    solver_stats = SolverStats()
+    for heuristic in BRANCHING_HEURISTICS:
+        solve(load(PUZZLES[0]), heuristic=heuristic, stats=solver_stats)
+    assert solver_stats.heuristics == dict.fromkeys(BRANCHING_HEURISTICS, 1)
+
+
+def test_count_solutions_finds_distinct_solutions():
+    for puzzle in PUZZLES:
+        akari = load(puzzle)
+        count, solutions = count_solutions(akari, limit=10)
+        assert count == len(solutions) and count >= 1, puzzle
+        assert all(solution.is_solved() for solution in solutions), puzzle
+        assert len({tuple(solution.assigned_lamps()) for solution in solutions}) == count, puzzle
+        # the order branches are explored in must not change how many solutions there are
+        for heuristic in BRANCHING_HEURISTICS:
+            assert count_solutions(akari, limit=10, heuristic=heuristic)[0] == count, (puzzle, heuristic)
+        assert count_solutions(akari, limit=10, engine='sat')[0] == count, puzzle
+
+    # steve/hard/7 has six solutions, the search stops at the limit
+    assert count_solutions(load('steve/hard/7'), limit=4)[0] == 4
+    assert count_solutions(load('steve/hard/7'), limit=10)[0] == 6
+
+
+def side_by_side(akari: Akari, copies: int) -> Akari:
+    # copies of a puzzle in a row, each separated by a column of black cells
+    size_x = akari.grid_size_x
+    wide = Akari(copies * (size_x + 1) - 1, akari.grid_size_y)
+    for (x, y), cell in wide.cells.items():
+        offset = x % (size_x + 1)
+        if offset == size_x:
+            cell.is_black = True
+        else:
+            source = akari.cells[(offset, y)]
+            cell.is_black = source.is_black
+            cell.number = source.number
+    return wide
+
+
+def test_independent_regions_multiply_solution_counts():
+    # steve/hard/5 has two solutions, side by side copies are independent regions
+    wide = side_by_side(load('steve/hard/5'), 3)
+    stats = {}
+    solution = solve(wide, stats=stats)[0]
+    assert solution is not None and solution.is_solved()
+    assert stats['regions'] >= 3
+    count, solutions = count_solutions(wide, limit=100)
+    assert count == 8 and all(solution.is_solved() for solution in solutions)
+    assert len({tuple(solution.assigned_lamps()) for solution in solutions}) == 8
+    assert count_solutions(wide, limit=100, decompose=False)[0] == 8
+    assert count_solutions(wide, limit=5)[0] == 5
+
+
+def test_parallel_search_is_independent_of_worker_count():
+    for puzzle in ['steve/hard/2', 'steve/hard/7', 'light_up_online/hard/4848983']:
+        akari = load(puzzle)
+        one, three = {}, {}
+        solution = solve(akari, workers=1, stats=one)[0]
+        split = solve(akari, workers=3, stats=three)[0]
+        assert solution is not None and split is not None, puzzle
+        assert solution.is_solved() and split.assigned_lamps() == solution.assigned_lamps(), puzzle
+        assert one == three, puzzle
+
+        count, solutions = count_solutions(akari, limit=4, workers=2)
+        assert count == count_solutions(akari, limit=4)[0], puzzle
+        assert [s.assigned_lamps() for s in solutions] == [s.assigned_lamps() for s in count_solutions(akari, limit=4, workers=3)[1]], puzzle
+
+    # max_depth is shared out between the subproblems rather than given to each of them
+    serial, one, three = {}, {}, {}
+    count_solutions(Akari(6, 6), limit=10**6, max_depth=400, stats=serial)
+    count_solutions(Akari(6, 6), limit=10**6, max_depth=400, workers=1, stats=one)
+    count_solutions(Akari(6, 6), limit=10**6, max_depth=400, workers=3, stats=three)
+    assert one == three and one['depth'] <= serial['depth']
+
+
+def test_batch_solver_reports_the_solve_counters():
+    import json, tempfile
+    import solveAkariBatch
+
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, 'results.jsonl')
+        assert solveAkariBatch.main(['-w', '2', '-o', output, 'puzzles/steve/hard', 'puzzles/nikoli_sample']) == 0
+        with open(output) as results:
+            results = [json.loads(line) for line in results]
+
+    assert [result['file'] for result in results] == solveAkariBatch.find_puzzles(['puzzles/steve/hard', 'puzzles/nikoli_sample'])
+    for result in results:
+        akari = load(os.path.relpath(result['file'], 'puzzles'))
+        solution, *counters = solve(akari)
+        assert solution is not None and result['solved'] and result['error'] is None, result['file']
+        assert [result[key] for key in solveAkariBatch.FIELDS[7:12]] == counters, result['file']
+        assert result['initial_prop_iters'] == solution.initial_propogation_iterations, result['file']
+        assert result['unique'] == (count_solutions(akari)[0] == 1), result['file']
+
+    # a max_depth that only just lets the solve through doesn't cut the uniqueness check short
+    options = {'engine': 'backtracking', 'heuristic': 'clue_first', 'max_depth': 11, 'unique': True, 'cache': None}
+    result = solveAkariBatch.solve_file('puzzles/steve/hard/5', options)
+    assert result['solved'] and result['unique'] is False
+
+
+def test_benchmark_flags_regressions_against_a_baseline():
+    import benchmarkAkari
+
+    cases = benchmarkAkari.find_cases(['submission'])
+    assert {case.group for case in cases} == {'submission/easy', 'submission/hard'}
+    results = benchmarkAkari.run_benchmarks(cases, list(benchmarkAkari.BENCHMARKS), repeat=2, warmup=0)
+    assert len(results) == len(cases) * len(benchmarkAkari.BENCHMARKS)
+
+    baseline = {key: dict(result) for key, result in results.items()}
+    assert benchmarkAkari.compare(results, baseline, 0.25, 0.002, 65536) == []
+
+    key = f'solve {cases[0].puzzle}'
+    baseline[key]['nodes'] -= 1
+    baseline[key]['time'] /= 10
+    assert benchmarkAkari.compare(results, baseline, 0.25, 0, 65536) == [
+        f'{key}: time {baseline[key]["time"] * 1000:.2f}ms -> {results[key]["time"] * 1000:.2f}ms',
+        f'{key}: nodes {baseline[key]["nodes"]} -> {results[key]["nodes"]}',
+    ]
+
+
+def test_solver_stats_add_up_searches_and_time_phases():
+    akari = load('light_up_online/hard/4848983')
+    expected = {}
+    solve(akari, stats=expected)
+
+    events = []
+    stats = SolverStats(node_hooks=[lambda event, level, cell, state: events.append((event, level, state.values[cell]))])
+    solution, *counters = solve(akari, stats=stats)
+    assert solution is not None and solution.is_solved()
+    assert {**stats.counters, 'heuristic': 'clue_first'} == expected and stats.heuristics == {'clue_first': 1} and stats.searches == 1
+    assert [counters[0], counters[3]] == [stats['depth'], stats['backtracks']]
+    assert {'initial_propagation', 'propagation', 'forward_check', 'branching'} <= set(stats.phase_times)
+    assert [event for event in events if event[0] == 'solution'] and all(level >= 1 for _, level, _ in events)
+    assert all(value in (LAMP, NO_LAMP) for event, _, value in events if event == 'decide')
+
+    basic = {}
+    solve_basic(akari, stats=basic)
+    solve_basic(akari, stats=stats)
+    assert stats.searches == 2 and stats['depth'] == expected['depth'] + basic['depth']
+
+    disabled = SolverStats(enabled=False, node_hooks=[lambda *event: events.append(event)])
+    count = len(events)
+    solve(akari, stats=disabled)
+    assert {**disabled.counters, 'heuristic': 'clue_first'} == expected and not disabled.phase_times and len(events) == count
+
+    # merging adds the other stats' searches as they are, none for empty stats
+    stats.merge(disabled)
+    stats.merge(SolverStats())
+    assert stats.searches == 3 and stats['depth'] == 2 * expected['depth'] + basic['depth']
+    assert stats.heuristics == {'clue_first': 3}
+
+
+def test_parallel_generation_is_reproducible_from_its_seed():
+    from akari_parallel import generation_attempt
+    puzzles = []
+    for workers in (1, 2):
+        generator = AkariGenerator(stats=SolverStats())
+        akari = generator.generate_akari_puzzle(7, 7, 1, workers=workers, seed=5)
+        assert generator.attempts > 0 and generator.attempts_per_second > 0
+        assert generator.stats.searches > 0 and 'candidates' in generator.stats.phase_times
+        assert count_solutions(akari)[0] == 1
+        puzzles.append((bytes(akari.kinds), bytes(akari.clues)))
+    assert puzzles[0] == puzzles[1]
+
+    # seeding a generation leaves the caller's random state alone
+    generator = AkariGenerator()
+    random.seed(6)
+    before = random.getstate()
+    generator.generate_akari_puzzle(5, 5, 1, seed=5)
+    options = {'timed': False, 'repair': 'targeted', 'construction': 'random', 'rating': 'search', 'cache': None}
+    attempts = [generation_attempt(5, 5, 1, None, '5-0', options)[0] for _ in range(2)]
+    assert random.getstate() == before and attempts[0] == attempts[1]
+
+
+def test_targeted_repair_makes_a_puzzle_unique():
+    for puzzle in ['steve/hard/2', 'steve/hard/7', 'submission/akari_hard_1']:
+        for prefer_walls in (False, True):
+            akari = load(puzzle)
+            first, second = count_solutions(akari)[1]
+            edits = AkariGenerator().distinguishing_edits(akari, first, second, prefer_walls)
+            assert edits, puzzle
+
+            unique, solution = AkariGenerator(rng=random.Random(0)).repair_for_single_solution(akari, prefer_walls=prefer_walls)
+            assert unique and solution is not None and solution.is_solved(), puzzle
+            assert count_solutions(akari)[0] == 1, puzzle
+
+
+def test_solution_first_generation_is_solvable_by_construction():
+    random.seed(2)
+    generator = AkariGenerator(construction='solution_first')
+    for size in (5, 7, 10):
+        akari = generator.solution_first_candidate(size, size)
+        assert all(number != NO_CLUE for number, kind in zip(akari.clues, akari.kinds) if kind == BLACK)
+        assert count_solutions(akari, 1)[0] == 1
+
+    for difficulty in (1, 2, 3):
+        akari = generator.generate_akari_puzzle(7, 7, difficulty, seed=difficulty)
+        assert count_solutions(akari)[0] == 1
+
+
+def test_deduction_rating_follows_the_unique_solution():
+    from akari_rating import rate, DeductionRater, CLUE_PATTERNS, CONTRADICTION_PROBING, SEARCH
+
+    for puzzle in PUZZLES:
+        akari = load(puzzle)
+        count, solutions = count_solutions(akari)
+        rater = DeductionRater(akari)
+        rating = rater.rate()
+        if count == 1:
+            # every deduction is sound, and tiers up to probing finish all of the bundled puzzles
+            assert rating.solved and rating.tier < SEARCH, puzzle
+            assert [v == LAMP for v in rater.state.values] == [v == LAMP for v in solutions[0].values], puzzle
+            assert sum(rating.steps.values()) > 0, puzzle
+        else:
+            assert rating.tier == SEARCH and not rating.solved, puzzle
+
+        capped = rate(akari, CLUE_PATTERNS)
+        assert capped.stopped == (rating.tier > CLUE_PATTERNS), puzzle
+        if capped.stopped:
+            assert capped.tier == CONTRADICTION_PROBING, puzzle
+
+    random.seed(3)
+    generator = AkariGenerator(construction='solution_first', rating='deduction')
+    for difficulty, (low, high) in ((1, (1, 2)), (2, (3, 3))):
+        akari = generator.generate_akari_puzzle(7, 7, difficulty)
+        assert low <= rate(akari).tier <= high
+
+
+def test_result_cache_is_shared_between_orientations():
+    import tempfile
+    import akari_cache
+    from akari_cache import ResultCache, Fingerprint, symmetries
+    from akari_rating import rate, CLUE_PATTERNS
+
+    akari = load('steve/hard/2')
+    orientations = []
+    for size_x, size_y, index_map in symmetries(akari.grid_size_x, akari.grid_size_y):
+        turned = Akari(size_x, size_y)
+        for i, j in enumerate(index_map):
+            turned.kinds[j] = akari.kinds[i]
+            turned.clues[j] = akari.clues[i]
+        turned.invalidate_geometry()
+        orientations.append(turned)
+    assert len({Fingerprint(turned).key for turned in orientations}) == 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'cache.sqlite')
+        cache = ResultCache(path)
+        expected = solve(akari)[1:]
+        count_expected = {}
+        count, _ = count_solutions(akari, stats=count_expected)
+        for turned in orientations:
+            stats = {}
+            solution, *counters = solve(turned, stats=stats, cache=cache)
+            assert solution is not None and solution.is_solved() and counters == list(expected) and stats['depth'] == expected[0]
+            # a count to 2 answers a count to 1, and not the other way around
+            assert count_solutions(turned, 1, cache=cache)[0] == 1
+            count_stats = {}
+            cached_count, solutions = count_solutions(turned, stats=count_stats, cache=cache)
+            assert cached_count == count and all(solution.is_solved() for solution in solutions)
+            assert count_stats == count_expected
+        assert cache.stats() == {'entries': 1, 'hits': 21, 'misses': 3}
+        # a hit counts the heuristic into a SolverStats the same as the search did
+        searched, reused = SolverStats(), SolverStats()
+        solve(orientations[1], heuristic='fewest_sources', stats=searched, cache=cache)
+        solve(orientations[2], heuristic='fewest_sources', stats=reused, cache=cache)
+        assert searched.heuristics == reused.heuristics == {'fewest_sources': 1} and searched.counters == reused.counters
+        assert cache.stats() == {'entries': 1, 'hits': 22, 'misses': 4}
+        # a search sharing a DeadStateTable or split between workers doesn't answer a plain one
+        settings_cache = ResultCache(os.path.join(directory, 'settings.sqlite'))
+        assert solve(akari, workers=2, cache=settings_cache)[1:] != expected
+        assert solve(akari, cache=settings_cache)[1:] == expected
+        pruned = load('light_up_online/hard/4848983')
+        dead_states = DeadStateTable()
+        plain = solve(pruned, dead_states=dead_states)[1:]
+        assert solve(pruned, dead_states=dead_states, cache=settings_cache)[1:] != plain
+        assert solve(pruned, cache=settings_cache)[1:] == plain
+        assert settings_cache.stats() == {'entries': 2, 'hits': 0, 'misses': 4}
+        settings_cache.close()
+        assert str(rate(orientations[3], CLUE_PATTERNS, cache)) == str(rate(akari, CLUE_PATTERNS))
+
+        # a setting written through another connection in between is kept, and a read of a
+        # recently used entry doesn't write
+        key = Fingerprint(akari).key
+        other = ResultCache(path)
+        solve_entry = cache.entry(key)['solve']
+        other.update(key, 'solve', {'counters': []}, 'other')
+        cache.update(key, 'solve', {'counters': []}, 'mine')
+        assert cache.entry(key)['solve'] == {**solve_entry, 'other': {'counters': []}, 'mine': {'counters': []}}
+        changes = cache.connection.total_changes
+        cache.entry(key)
+        assert cache.connection.total_changes == changes
+        other.close()
+        cache.close()
+
+        # entries of another solver version are dropped, and past max_entries the oldest are
+        version = akari_cache.SOLVER_VERSION
+        akari_cache.SOLVER_VERSION = version + 1
+        try:
+            cache = ResultCache(path, max_entries=2)
+            assert len(cache) == 0
+            for puzzle in PUZZLES[:4]:
+                solve(load(puzzle), cache=cache)
+            assert len(cache) == 2
+            cache.close()
+        finally:
+            akari_cache.SOLVER_VERSION = version
+
+        # a generator run seeded the same finds the same puzzle with every check a cache hit
+        cache = ResultCache(path)
+        puzzles = []
+        for _ in range(2):
+            generator = AkariGenerator(cache=cache)
+            akari = generator.generate_akari_puzzle(5, 5, 1, seed=4)
+            puzzles.append((bytes(akari.kinds), bytes(akari.clues)))
+        misses = cache.misses
+        AkariGenerator(cache=cache).generate_akari_puzzle(5, 5, 1, seed=4)
+        assert puzzles[0] == puzzles[1] and cache.misses == misses
+        cache.close()
+
+
+def test_batch_evaluation_matches_solution_state():
+    from akari_batch import evaluate_states, evaluate_batch, stack_puzzles, lamps_from_cells, forced_lamps_conflict
+
+    rng = random.Random(7)
+    for puzzle in PUZZLES:
+        akari = load(puzzle)
+        white = [i for i, kind in enumerate(akari.kinds) if kind != BLACK]
+        solution = solve(akari)[0]
+        assert solution is not None, puzzle
+        states = [solution]
+        for _ in range(20):
+            state = SolutionState(akari, auto_find_cells_that_must_have_lamps=False)
+            for _ in range(rng.randint(0, 12)):
+                state.assign(rng.choice(white), LAMP)
+            states.append(state)
+
+        report = evaluate_states(states)
+        for n, state in enumerate(states):
+            assert report['valid'][n] == state.is_valid(), puzzle
+            assert report['solved'][n] == state.is_solved(), puzzle
+            assert report['unlit'][n] == len(state.unilluminated_cells()), puzzle
+            assert report['lit_lamps'][n] == len(state.illuminated_lamps()), puzzle
+
+    # the vectorized forced lamps are the ones must_have_lamp_indices finds board by board
+    random.seed(8)
+    generator = AkariGenerator()
+    boards = []
+    for _ in range(200):
+        akari = Akari(8, 8)
+        generator.add_black_cells_and_clues(akari)
+        boards.append(akari)
+    black, clues = stack_puzzles(boards)
+    expected = ~evaluate_batch(black, clues, lamps_from_cells(boards, [akari.cells_that_must_have_lamps() for akari in boards]))['valid']
+    assert (forced_lamps_conflict(boards) == expected).all() and expected.any() and not expected.all()
+
+    # survivors of a batch are kept for the next candidates instead of being drawn again
+    akari = generator.batch_candidate(8, 8, 32)
+    assert not generator.lamps_must_intersect(akari) and generator.screened[(8, 8)]
+
+
+if __name__ == '__main__':
+    test_incremental_illumination_matches_full_recompute()
+    test_bitboard_engine_matches_backtracking()
+    test_backjumping_keeps_solutions()
+    test_dead_state_table_is_reused_across_searches()
+    test_sat_engine_solves()
+    test_every_branching_heuristic_solves()
+    test_count_solutions_finds_distinct_solutions()
+    test_independent_regions_multiply_solution_counts()
+    test_parallel_search_is_independent_of_worker_count()
+    test_batch_solver_reports_the_solve_counters()
+    test_benchmark_flags_regressions_against_a_baseline()
+    test_solver_stats_add_up_searches_and_time_phases()
+    test_parallel_generation_is_reproducible_from_its_seed()
+    test_targeted_repair_makes_a_puzzle_unique()
+    test_solution_first_generation_is_solvable_by_construction()
+    test_deduction_rating_follows_the_unique_solution()
+    test_result_cache_is_shared_between_orientations()
+    test_batch_evaluation_matches_solution_state()